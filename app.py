@@ -18,7 +18,7 @@ from logging_manager import add_log, set_analysis_state
 # Import route blueprints
 from routes.index_routes import index_bp
 from routes.upload_routes import upload_bp
-from routes.api_routes import api_bp
+from routes.api_routes import api_bp, get_threads, get_thread_content_legacy
 from routes.analysis_routes import analysis_bp
 
 def create_app():
@@ -53,20 +53,9 @@ def create_app():
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(analysis_bp, url_prefix='/api')
     
-    # Register legacy routes for compatibility with frontend
-    @app.route('/get_threads')
-    def legacy_get_threads():
-        """Legacy endpoint for thread listing - redirects to the API endpoint"""
-        add_log(f"Legacy get_threads called with args: {request.args}", "info")
-        from routes.api_routes import get_threads
-        return get_threads()
-        
-    @app.route('/get_thread_content')
-    def legacy_get_thread_content():
-        """Legacy endpoint for thread content - redirects to the API endpoint"""
-        add_log(f"Legacy get_thread_content called with args: {request.args}", "info")
-        from routes.api_routes import get_thread_content_legacy
-        return get_thread_content_legacy()
+    # Register legacy routes for compatibility with frontend - same views as the API endpoints
+    app.add_url_rule('/get_threads', 'legacy_get_threads', get_threads)
+    app.add_url_rule('/get_thread_content', 'legacy_get_thread_content', get_thread_content_legacy)
     
     # Setup path for uploaded files
     
@@ -1,8 +1,17 @@
+import io
 import json
 import logging
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Union
 import os
+import mmap
+import sys
+from array import array
+from collections import defaultdict
+from itertools import groupby, islice
+from operator import itemgetter
+import re
+import zlib
 import text_processor  # Added missing import
 
 # Get logger
@@ -11,41 +20,173 @@ logger = logging.getLogger('hitcraft_analyzer')
 # Maximum chunk size in characters that Claude can handle
 MAX_CHUNK_SIZE = 100000  # ~100K characters
 
-def load_chat_data(file_path: str) -> List[Dict[str, Any]]:
+# Sort key for messages without a createdAt date
+DEFAULT_MESSAGE_TIMESTAMP = "1970-01-01T00:00:00Z"
+
+# Read size used when streaming JSON chat exports
+JSON_READ_SIZE = 1 << 16
+JSON_WHITESPACE_CHARS = ' \t\r\n'
+JSON_SKIP_CHARS = JSON_WHITESPACE_CHARS + '\ufeff'
+# Matches a token (number, literal or escape) that runs to the end of the buffer
+# and may continue in the next read
+JSON_PARTIAL_TOKEN = re.compile(r'[^\s{}\[\],:"]*\Z')
+
+def _json_decode_error(msg: str, buf: str, pos: int, offset: int, lines: int, line_start: int) -> json.JSONDecodeError:
     """
-    Load chat data from a JSON file
+    Build a JSONDecodeError for buf[pos] that reports its position in the whole file
     
     Args:
-        file_path: Path to the JSON file
+        msg: Error message
+        buf: Current read buffer
+        pos: Error position in buf
+        offset: File position of buf[0]
+        lines: Number of newlines before buf[0]
+        line_start: File position of the start of the line buf[0] is on
         
     Returns:
-        List of chat message objects
+        The error, ready to raise
+    """
+    file_pos = offset + pos
+    newline = buf.rfind('\n', 0, pos)
+    lineno = lines + buf.count('\n', 0, pos) + 1
+    colno = pos - newline if newline >= 0 else file_pos - line_start + 1
+    error = json.JSONDecodeError(msg, buf, pos)
+    error.args = (f"{msg}: line {lineno} column {colno} (char {file_pos})",)
+    error.pos, error.lineno, error.colno = file_pos, lineno, colno
+    return error
+
+def _iter_json_messages(f) -> Iterator[Dict[str, Any]]:
+    """
+    Incrementally decode chat messages from an open JSON text file
+    
+    A top-level array is decoded one element at a time from a rolling buffer;
+    a single top-level object is yielded as the only message.
+    
+    Args:
+        f: File object opened in text mode
+        
+    Yields:
+        Chat message objects
+    """
+    decoder = json.JSONDecoder()
+    buf = f.read(JSON_READ_SIZE)
+    eof = not buf
+    pos = 0
+    # Position of buf in the file, for error messages
+    offset = lines = line_start = 0
+    
+    # Skip leading whitespace (and a UTF-8 BOM) to find out what the file holds
+    while True:
+        while pos < len(buf) and buf[pos] in JSON_SKIP_CHARS:
+            pos += 1
+        if pos < len(buf) or eof:
+            break
+        newlines = buf.count('\n')
+        if newlines:
+            lines += newlines
+            line_start = offset + buf.rfind('\n') + 1
+        offset += len(buf)
+        buf = f.read(JSON_READ_SIZE)
+        eof = not buf
+        pos = 0
+    
+    if pos == len(buf):
+        raise _json_decode_error("Expecting value", buf, pos, offset, lines, line_start)
+    
+    if buf[pos] == '<':
+        logger.error("File appears to be HTML, not JSON")
+        raise ValueError("The uploaded file appears to be HTML, not JSON. Please check the file and try again.")
+    
+    if buf[pos] != '[':
+        # If chat_data is a single JSON object instead of an array,
+        # treat it as a list with a single item
+        logger.info("JSON is not a list, converting to list with single item")
+        yield json.loads(buf[pos:] + f.read())
+        return
+    
+    pos += 1
+    read_size = JSON_READ_SIZE
+    # What the array allows next: "first" value or "]", a "value" after a
+    # comma, a "separator" after a value, or only whitespace at the "end"
+    expect = "first"
+    while True:
+        # Skip whitespace between tokens
+        while pos < len(buf) and buf[pos] in JSON_WHITESPACE_CHARS:
+            pos += 1
+        
+        if pos < len(buf):
+            char = buf[pos]
+            if expect == "end":
+                raise _json_decode_error("Extra data", buf, pos, offset, lines, line_start)
+            if expect == "separator":
+                if char not in ',]':
+                    raise _json_decode_error("Expecting ',' delimiter", buf, pos, offset, lines, line_start)
+                pos += 1
+                expect = "value" if char == ',' else "end"
+                continue
+            if char == ']' and expect == "first":
+                pos += 1
+                expect = "end"
+                continue
+            
+            # A comma or "]" here is rejected by the decoder as a missing value
+            try:
+                message, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                # Only an error at the end of the buffer can be fixed by reading
+                # more; anything else is malformed input
+                truncated = e.msg.startswith("Unterminated string") or JSON_PARTIAL_TOKEN.match(buf, e.pos)
+                if eof or not truncated:
+                    raise _json_decode_error(e.msg, buf, e.pos, offset, lines, line_start) from None
+            else:
+                # A value that runs to the end of the buffer may be cut short
+                if eof or not JSON_PARTIAL_TOKEN.match(buf, end):
+                    yield message
+                    pos = end
+                    expect = "separator"
+                    read_size = JSON_READ_SIZE
+                    continue
+        elif eof:
+            if expect == "end":
+                return
+            msg = "Expecting ',' delimiter" if expect == "separator" else "Expecting value"
+            raise _json_decode_error(msg, buf, pos, offset, lines, line_start)
+        
+        # Need more input: keep the unconsumed tail and grow the read size so
+        # a single oversized message doesn't get re-decoded over and over
+        newlines = buf.count('\n', 0, pos)
+        if newlines:
+            lines += newlines
+            line_start = offset + buf.rfind('\n', 0, pos) + 1
+        offset += pos
+        more = f.read(read_size)
+        eof = not more
+        buf = buf[pos:] + more
+        pos = 0
+        read_size = max(read_size, len(buf))
+
+def load_chat_data(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream chat data from a JSON file
+    
+    Messages are decoded one at a time, so the whole file is never held in
+    memory as a string or as a parsed object tree.
+    
+    Args:
+        file_path: Path to the JSON file
+        
+    Yields:
+        Chat message objects
     """
     logger.info(f"Loading chat data from {file_path}")
+    count = 0
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
-            # Read the raw content first
-            content = f.read()
-            
-            # Check if the content appears to be HTML instead of JSON
-            if content.strip().startswith('<!DOCTYPE') or content.strip().startswith('<html'):
-                logger.error("File appears to be HTML, not JSON")
-                raise ValueError("The uploaded file appears to be HTML, not JSON. Please check the file and try again.")
-            
-            # Log the first 200 characters for debugging
-            logger.info(f"First 200 chars of the file: {content[:200]}")
-            
-            # Parse JSON
-            chat_data = json.loads(content)
-            
-            # If chat_data is a single JSON object instead of an array, 
-            # wrap it in a list to ensure consistent processing
-            if not isinstance(chat_data, list):
-                logger.info("JSON is not a list, converting to list with single item")
-                chat_data = [chat_data]
-            
-        logger.info(f"Successfully loaded {len(chat_data)} messages")
-        return chat_data
+            for message in _iter_json_messages(f):
+                count += 1
+                yield message
+        
+        logger.info(f"Successfully loaded {count} messages")
     except json.JSONDecodeError as e:
         logger.error(f"JSON parse error: {str(e)}")
         raise ValueError(f"Invalid JSON format: {str(e)}")
@@ -66,35 +207,41 @@ def load_json_chat(file_path: str) -> Dict[str, List[Dict[str, Any]]]:
     chat_data = load_chat_data(file_path)
     return organize_chats_by_thread(chat_data)
 
-def organize_chats_by_thread(chat_data: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+def organize_chats_by_thread(chat_data: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
     """
     Group chat messages by their thread ID
     
     Args:
-        chat_data: List of chat message objects
+        chat_data: Chat message objects, consumed lazily
         
     Returns:
         Dictionary with thread IDs as keys and lists of messages as values
     """
     logger.info("Organizing chats by thread ID")
-    threads = {}
+    threads = defaultdict(list)
+    missing_thread_ids = 0
+    log_missing = logger.isEnabledFor(logging.DEBUG)
     
     for message in chat_data:
         # Extract the thread ID - using $oid value from the threadId field
-        if "threadId" in message and "$oid" in message["threadId"]:
-            thread_id = message["threadId"]["$oid"]
+        thread_ref = message.get("threadId")
+        if thread_ref and "$oid" in thread_ref:
+            thread_id = thread_ref["$oid"]
         else:
-            logger.warning(f"Message missing threadId, using message ID instead: {message.get('_id', {}).get('$oid', 'unknown')}")
             # Fallback to message ID if thread ID is not available
             thread_id = message.get("_id", {}).get("$oid", "unknown")
+            missing_thread_ids += 1
+            if log_missing:
+                logger.debug(f"Message missing threadId, using message ID instead: {thread_id}")
         
         # Add message to the appropriate thread
-        if thread_id not in threads:
-            threads[thread_id] = []
         threads[thread_id].append(message)
     
+    if missing_thread_ids:
+        logger.warning(f"{missing_thread_ids} messages were missing a threadId and were grouped by message ID instead")
+    
     logger.info(f"Identified {len(threads)} unique threads")
-    return threads
+    return dict(threads)
 
 def sort_messages_by_date(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
@@ -106,13 +253,66 @@ def sort_messages_by_date(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]
     Returns:
         Sorted list of messages
     """
-    def get_timestamp(message):
-        # Extract the timestamp from createdAt field
-        if "createdAt" in message and "$date" in message["createdAt"]:
-            return message["createdAt"]["$date"]
-        return "1970-01-01T00:00:00Z"  # Default date if not found
+    # Decorate each message with its timestamp once, sort on the key column, then strip
+    keyed = [
+        (created["$date"] if isinstance(created := message.get("createdAt"), dict) and "$date" in created
+         else DEFAULT_MESSAGE_TIMESTAMP, message)
+        for message in messages
+    ]
+    
+    # Exports are usually already in date order; one linear scan avoids the
+    # sort and the rebuild of the list in that case
+    if all(keyed[i][0] <= keyed[i + 1][0] for i in range(len(keyed) - 1)):
+        return list(messages)
+    
+    keyed.sort(key=itemgetter(0))
+    return [message for _, message in keyed]
+
+def get_message_timestamp(message: Dict[str, Any]) -> str:
+    """Extract the sort timestamp from a message's createdAt field"""
+    created = message.get("createdAt")
+    if isinstance(created, dict) and "$date" in created:
+        return created["$date"]
+    return DEFAULT_MESSAGE_TIMESTAMP
+
+# Shared read-only defaults for missing message fields
+EMPTY_FIELD = {}
+EMPTY_CONTENT = ()
+
+# Placeholders for non-text content item types
+CONTENT_TYPE_PLACEHOLDERS = {
+    "sketch_upload_request": "[Sketch upload request]",
+    "reference_candidates": "[Reference candidates]",
+    "reference_selection": "[Reference selection]",
+    "song_rendering_start": "[Song rendering started]",
+}
+
+def _format_dict_item(item: Dict[str, Any]) -> str:
+    """Format a content item object based on its type"""
+    item_type = item.get("type", "Unknown content")
+    if item_type == "text" and "text" in item:
+        return item["text"]
     
-    return sorted(messages, key=get_timestamp)
+    placeholder = CONTENT_TYPE_PLACEHOLDERS.get(item_type) if isinstance(item_type, str) else None
+    if placeholder is None:
+        # For any other types, add a placeholder
+        placeholder = f"[{item_type}]"
+    return placeholder
+
+def _format_other_item(item: Any) -> str:
+    """Format a content item that isn't a plain str or dict"""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        return _format_dict_item(item)
+    # For non-dict items, convert to string
+    return str(item)
+
+# Content item formatters keyed by exact item type
+CONTENT_ITEM_FORMATTERS = {
+    str: str,
+    dict: _format_dict_item,
+}
 
 def format_message_content(content: Any) -> str:
     """
@@ -136,73 +336,82 @@ def format_message_content(content: Any) -> str:
     if not isinstance(content, list):
         return str(content)
     
-    result = []
+    return "\n".join([
+        CONTENT_ITEM_FORMATTERS.get(type(item), _format_other_item)(item)
+        for item in content
+    ])
+
+def format_message_timestamp(date_str: str) -> str:
+    """
+    Format a message's ISO date as "YYYY-MM-DD HH:MM:SS"
     
-    for item in content:
-        # If item is a string, append it directly
-        if isinstance(item, str):
-            result.append(item)
-            continue
-            
-        # If item is a dict, process it based on type
-        if isinstance(item, dict):
-            if item.get("type") == "text" and "text" in item:
-                result.append(item["text"])
-            elif item.get("type") == "sketch_upload_request":
-                result.append("[Sketch upload request]")
-            elif item.get("type") == "reference_candidates":
-                result.append("[Reference candidates]")
-            elif item.get("type") == "reference_selection":
-                result.append("[Reference selection]")
-            elif item.get("type") == "song_rendering_start":
-                result.append("[Song rendering started]")
-            else:
-                # For any other types, add a placeholder
-                result.append(f"[{item.get('type', 'Unknown content')}]")
-        else:
-            # For non-dict items, convert to string
-            result.append(str(item))
+    Fields are formatted directly rather than through strftime, which is
+    noticeably slower when called once per message.
     
-    return "\n".join(result)
+    Args:
+        date_str: ISO 8601 date string, e.g. "2024-03-01T12:30:00.000Z"
+        
+    Returns:
+        Formatted timestamp, or date_str unchanged if it can't be parsed
+    """
+    try:
+        if date_str.endswith("Z"):
+            date_str_utc = date_str[:-1] + "+00:00"
+        else:
+            date_str_utc = date_str
+        dt = datetime.fromisoformat(date_str_utc)
+    except (AttributeError, TypeError, ValueError):
+        # Fallback if date parsing fails
+        return date_str
+    return f"{dt.year}-{dt.month:02d}-{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}"
 
-def format_conversation(messages: List[Dict[str, Any]]) -> str:
+def format_conversation(messages: List[Dict[str, Any]], buf: Optional[io.StringIO] = None) -> Optional[str]:
     """
     Format a list of messages into a readable conversation
     
     Args:
         messages: List of chat message objects
+        buf: Buffer to write the conversation into (default: a new one)
         
     Returns:
-        Formatted conversation string
+        Formatted conversation string, or None if it was written to buf
     """
-    conversation = []
+    own_buffer = buf is None
+    if own_buffer:
+        buf = io.StringIO()
+    
+    # This loop runs once per message, so module-level lookups are bound to
+    # locals and each message field is read only once
+    write = buf.write
+    format_timestamp = format_message_timestamp
+    format_content = format_message_content
+    role_labels = {}
+    separator = ""
     
     for message in messages:
         # Get timestamp
         timestamp = "Unknown time"
-        if "createdAt" in message and "$date" in message["createdAt"]:
-            try:
-                dt = datetime.fromisoformat(message["createdAt"]["$date"].replace("Z", "+00:00"))
-                timestamp = dt.strftime("%Y-%m-%d %H:%M:%S")
-            except:
-                # Fallback if date parsing fails
-                timestamp = message["createdAt"]["$date"]
+        created = message.get("createdAt")
+        if created is not None and "$date" in created:
+            timestamp = format_timestamp(created["$date"])
         
-        # Get role
+        # Get role, upper-casing each distinct role only once
         role = message.get("role", "unknown")
+        role_label = role_labels.get(role)
+        if role_label is None:
+            role_label = role_labels[role] = role.upper()
         
         # Get user ID
-        user_id = message.get("userId", {}).get("$oid", "unknown")
+        user_id = message.get("userId", EMPTY_FIELD).get("$oid", "unknown")
         
         # Get message content
-        content = format_message_content(message.get("content", []))
+        content = format_content(message.get("content", EMPTY_CONTENT))
         
-        # Format the message
-        formatted_message = f"[{timestamp}] {role.upper()} ({user_id}):\n{content}\n"
-        conversation.append(formatted_message)
+        # Write the message, separated from the previous one by a blank line
+        write(f"{separator}[{timestamp}] {role_label} ({user_id}):\n{content}\n")
+        separator = "\n"
     
-    # Join all formatted messages with a separator
-    return "\n".join(conversation)
+    return buf.getvalue() if own_buffer else None
 
 def format_threads_for_analysis(threads: Dict[str, List[Dict]]) -> str:
     """
@@ -214,31 +423,56 @@ def format_threads_for_analysis(threads: Dict[str, List[Dict]]) -> str:
     Returns:
         Formatted text with all threads
     """
-    result = []
+    # Single-thread exports are common; sort that thread on its own and skip
+    # tagging every message with its thread position
+    if len(threads) == 1:
+        thread_id, messages = next(iter(threads.items()))
+        buf = io.StringIO()
+        buf.write(f"Conversation #{thread_id}:\n\n")
+        format_conversation(sort_messages_by_date(messages), buf)
+        buf.write("\n\n")
+        return buf.getvalue()
     
-    for thread_id, messages in threads.items():
-        # Sort messages by date
-        sorted_messages = sort_messages_by_date(messages)
-        
-        # Format the conversation
-        formatted_conversation = format_conversation(sorted_messages)
-        
-        # Add thread header and footer
-        thread_text = f"Conversation #{thread_id}:\n\n{formatted_conversation}\n\n"
-        result.append(thread_text)
+    buf = io.StringIO()
+    thread_ids = list(threads)
+    
+    # Sort every message once by (thread position, date) instead of sorting
+    # each thread separately; the sort is stable so ties keep upload order
+    tagged_messages = [
+        (position, get_message_timestamp(message), message)
+        for position, thread_id in enumerate(thread_ids)
+        for message in threads[thread_id]
+    ]
+    tagged_messages.sort(key=itemgetter(0, 1))
+    
+    sorted_threads = {
+        position: [message for _, _, message in group]
+        for position, group in groupby(tagged_messages, key=itemgetter(0))
+    }
     
-    return "\n".join(result)
+    for position, thread_id in enumerate(thread_ids):
+        # Write the thread header, conversation and footer straight into the buffer
+        if position:
+            buf.write("\n")
+        buf.write(f"Conversation #{thread_id}:\n\n")
+        format_conversation(sorted_threads.get(position, []), buf)
+        buf.write("\n\n")
+    
+    return buf.getvalue()
 
-def process_chat_file(file_path: str, max_chunks: int = None) -> List[str]:
+def process_chat_file(file_path: str, max_chunks: int = None) -> Iterator[str]:
     """
     Process a chat file into chunks for analysis.
     
+    Chunks are yielded as they are cut, so they can be written out or
+    analyzed one at a time, e.g. save_chunks_to_store(process_chat_file(path), out_dir).
+    
     Args:
         file_path: Path to the chat file
         max_chunks: Maximum number of chunks to return (default: None = all chunks)
         
-    Returns:
-        List of chunks
+    Yields:
+        Chunks in order
     """
     filename = os.path.basename(file_path)
     logger.info(f"Processing chat file: {filename}")
@@ -250,58 +484,120 @@ def process_chat_file(file_path: str, max_chunks: int = None) -> List[str]:
         threads = load_json_chat(file_path)
         formatted_text = format_threads_for_analysis(threads)
         logger.info(f"Loaded JSON chat data with {len(threads)} threads")
+        del threads
     else:
         # Assume it's a text or RTF file
-        text = ""
+        text = text_processor.read_file(file_path)
         formatted_text = f"===== CHAT LOG =====\n\n{text}\n\n===== END CHAT LOG =====\n"
         logger.info(f"Loaded text chat data with {len(text)} characters")
+        del text
     
     # Create chunks from the formatted text
-    all_chunks = text_processor.create_chunks(formatted_text)
-    logger.info(f"Created {len(all_chunks)} chunks for analysis")
-    
-    # Print stats about the chunks
-    total_size = sum(len(chunk) for chunk in all_chunks)
-    avg_size = total_size / len(all_chunks) if all_chunks else 0
-    logger.info(f"Total content size: {total_size} characters, Average chunk size: {avg_size:.0f} characters")
-    
-    # Only log individual chunk sizes if there are a reasonable number of them
-    if len(all_chunks) <= 20:
-        for i, chunk in enumerate(all_chunks):
-            logger.info(f"Chunk {i+1} size: {len(chunk)} characters")
-    else:
-        logger.info(f"First chunk size: {len(all_chunks[0])} characters")
-        logger.info(f"Last chunk size: {len(all_chunks[-1])} characters")
+    chunks = text_processor.iter_chunks(formatted_text)
     
     # Limit the number of chunks if specified
-    if max_chunks and max_chunks > 0 and max_chunks < len(all_chunks):
+    if max_chunks and max_chunks > 0:
         logger.info(f"Limiting to {max_chunks} chunks as requested")
-        return all_chunks[:max_chunks]
+        chunks = islice(chunks, max_chunks)
+    
+    # Chunk statistics are accumulated while yielding, so no second pass or
+    # list of chunks is needed
+    chunk_count = 0
+    total_size = 0
+    max_size = 0
+    log_sizes = logger.isEnabledFor(logging.DEBUG)
+    for chunk in chunks:
+        size = len(chunk)
+        chunk_count += 1
+        total_size += size
+        if size > max_size:
+            max_size = size
+        if log_sizes:
+            logger.debug(f"Chunk {chunk_count} size: {size} characters")
+        yield chunk
     
-    return all_chunks
+    # Print stats about the chunks
+    avg_size = total_size / chunk_count if chunk_count else 0
+    logger.info(f"Created {chunk_count} chunks for analysis")
+    logger.info(f"Total content size: {total_size} characters, Average chunk size: {avg_size:.0f} characters, "
+                f"Largest chunk: {max_size} characters")
+
+CHUNK_STORE_FILE = 'chunks.bin'
+CHUNK_INDEX_FILE = 'chunks.idx'
+CHUNK_INDEX_TYPECODE = 'q'  # Index is a flat little-endian int64 array of (offset, length) pairs
+CHUNK_COMPRESSION_LEVEL = 1  # Fast zlib level; chat transcripts still shrink several times
+CHUNK_STORE_BUFFER_SIZE = 1 << 20  # Batch the many small compressed chunk writes into 1MB writes
 
-def save_chunks_to_files(chunks: List[str], output_dir: str) -> List[str]:
+def save_chunks_to_store(chunks: Iterable[str], output_dir: str) -> int:
     """
-    Save chunks to individual files
+    Save chunks to a single concatenated store with an offset index
+    
+    Each chunk is zlib-compressed and appended to chunks.bin, and its
+    (offset, length) pair is written to chunks.idx, so reading them back needs
+    two opens instead of one per chunk and moves far fewer bytes.
     
     Args:
-        chunks: List of chunk strings
-        output_dir: Directory to save files
+        chunks: Chunk strings to save
+        output_dir: Directory to save the store in
         
     Returns:
-        List of file paths
+        Number of chunks saved
     """
-    import os
-    
     # Create the output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    file_paths = []
-    for i, chunk in enumerate(chunks):
-        file_path = os.path.join(output_dir, f"chunk_{i}.txt")
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(chunk)
-        file_paths.append(file_path)
-        logger.info(f"Saved chunk {i+1} to {file_path} (size: {len(chunk)} characters)")
+    store_path = os.path.join(output_dir, CHUNK_STORE_FILE)
+    index_path = os.path.join(output_dir, CHUNK_INDEX_FILE)
+    
+    index = array(CHUNK_INDEX_TYPECODE)
+    offset = 0
+    raw_size = 0
+    with open(store_path, 'wb', buffering=CHUNK_STORE_BUFFER_SIZE) as store:
+        for chunk in chunks:
+            raw = chunk.encode('utf-8')
+            data = zlib.compress(raw, CHUNK_COMPRESSION_LEVEL)
+            store.write(data)
+            index.append(offset)
+            index.append(len(data))
+            offset += len(data)
+            raw_size += len(raw)
+    
+    # Write the whole index in one go once every chunk is in the store
+    if sys.byteorder != 'little':
+        index.byteswap()
+    with open(index_path, 'wb') as f:
+        index.tofile(f)
+    
+    count = len(index) // 2
+    logger.info(f"Saved {count} chunks to {store_path} (size: {offset} bytes, uncompressed: {raw_size} bytes)")
+    return count
+
+def load_chunks_from_store(output_dir: str, decode: bool = True) -> Iterator[Union[str, bytes]]:
+    """
+    Read chunks back from a store written by save_chunks_to_store
+    
+    Args:
+        output_dir: Directory containing the store
+        decode: If False, yield raw UTF-8 bytes instead of strings
+        
+    Yields:
+        Each chunk in the order it was saved
+    """
+    store_path = os.path.join(output_dir, CHUNK_STORE_FILE)
+    index_path = os.path.join(output_dir, CHUNK_INDEX_FILE)
+    
+    index = array(CHUNK_INDEX_TYPECODE)
+    with open(index_path, 'rb') as f:
+        index.frombytes(f.read())
+    if sys.byteorder != 'little':
+        index.byteswap()
+    
+    if not index:
+        return
     
-    return file_paths
+    with open(store_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as store:
+        # Decompress straight from the mapping without copying each record out first
+        with memoryview(store) as view:
+            for offset, length in zip(index[0::2], index[1::2]):
+                data = zlib.decompress(view[offset:offset + length])
+                yield data.decode('utf-8') if decode else data
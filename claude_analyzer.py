@@ -1,29 +1,253 @@
 import os
-import json
+import orjson
+import hashlib
+import functools
+import heapq
+import copy
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import logging
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from collections import defaultdict, deque
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
 import traceback
+import config
 
 # Get logger
 logger = logging.getLogger('hitcraft_analyzer')
 
-def analyze_chunks(chunks: List[str], api_key: str = None, use_mock: bool = False, max_chunks: int = None) -> List[Dict[str, Any]]:
+# Maximum number of concurrent requests to the Claude API
+CLAUDE_MAX_CONCURRENCY = int(os.environ.get('CLAUDE_MAX_CONCURRENCY', 8))
+
+# Number of chunks sent to Claude together in one request, and the rough
+# input token budget of such a request; larger chunks are sent on their own
+CLAUDE_CHUNKS_PER_CALL = int(os.environ.get('CLAUDE_CHUNKS_PER_CALL', 4))
+CLAUDE_BATCH_MAX_INPUT_TOKENS = int(os.environ.get('CLAUDE_BATCH_MAX_INPUT_TOKENS', 40000))
+
+CLAUDE_API_URL = "https://api.anthropic.com/v1/messages"
+CLAUDE_API_VERSION = "2023-06-01"
+
+# Message Batches API: half-price asynchronous processing for bulk analyses.
+# Off by default since a batch can take much longer than direct requests
+CLAUDE_BATCHES_URL = CLAUDE_API_URL + "/batches"
+CLAUDE_USE_MESSAGE_BATCHES = os.environ.get('CLAUDE_USE_MESSAGE_BATCHES', '').lower() in ('1', 'true', 'yes')
+MESSAGE_BATCH_MIN_CHUNKS = 4  # Fewer uncached chunks than this are sent directly
+MESSAGE_BATCH_POLL_SECONDS = 30
+# Seconds to wait for a batch before canceling it and analyzing the chunks directly
+MESSAGE_BATCH_MAX_WAIT = int(os.environ.get('MESSAGE_BATCH_MAX_WAIT', 60 * 60))
+
+def _create_claude_session() -> requests.Session:
+    """
+    Create the HTTP session shared by all Claude API calls
+    
+    Worker threads reuse kept-alive connections from one pool instead of
+    paying a TLS handshake per request. Connection errors and overload
+    responses are retried with backoff; once retries run out the last
+    response is returned so callers can handle the error status themselves.
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504, 529),
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False
+    )
+    # Enough kept-alive connections for every worker that may call Claude at once
+    pool_size = max(CLAUDE_MAX_CONCURRENCY, config.ANALYSIS_MAX_WORKERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    http_session = requests.Session()
+    http_session.mount("https://", adapter)
+    
+    # Headers shared by every request; callers only add their x-api-key
+    http_session.headers.update({
+        "Content-Type": "application/json",
+        "anthropic-version": CLAUDE_API_VERSION
+    })
+    return http_session
+
+# Module-level so every thread shares the same connection pool
+claude_session = _create_claude_session()
+
+# Account rate limits for the Claude API; the limiter re-seeds itself from the
+# anthropic-ratelimit-* headers, so these only need to be roughly right
+CLAUDE_REQUESTS_PER_MINUTE = int(os.environ.get('CLAUDE_REQUESTS_PER_MINUTE', 50))
+CLAUDE_TOKENS_PER_MINUTE = int(os.environ.get('CLAUDE_TOKENS_PER_MINUTE', 40000))
+
+class RateLimiter:
+    """
+    Token bucket for Claude requests and input tokens
+    
+    Callers wait in acquire() until both buckets have room, so concurrent
+    workers stay under the account limits instead of running into 429s.
+    Thread-safe; shared by every worker through claude_rate_limiter.
+    """
+    
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.max_requests = float(requests_per_minute)
+        self.max_tokens = float(tokens_per_minute)
+        self.requests_available = self.max_requests
+        self.tokens_available = self.max_tokens
+        self.blocked_until = 0.0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.requests_available = min(self.max_requests, self.requests_available + elapsed * self.max_requests / 60)
+        self.tokens_available = min(self.max_tokens, self.tokens_available + elapsed * self.max_tokens / 60)
+    
+    def acquire(self, tokens: int) -> None:
+        """Block until a request using about `tokens` input tokens may be sent"""
+        # A request larger than the whole bucket still has to go out eventually
+        tokens = min(tokens, self.max_tokens)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.requests_available >= 1 and self.tokens_available >= tokens:
+                        self.requests_available -= 1
+                        self.tokens_available -= tokens
+                        return
+                    wait = max(
+                        (1 - self.requests_available) * 60 / self.max_requests,
+                        (tokens - self.tokens_available) * 60 / self.max_tokens
+                    )
+            time.sleep(wait)
+    
+    def update_from_headers(self, headers) -> None:
+        """Re-seed the buckets from the API's view of the remaining limits"""
+        requests_remaining = headers.get("anthropic-ratelimit-requests-remaining")
+        tokens_remaining = headers.get("anthropic-ratelimit-input-tokens-remaining") or headers.get("anthropic-ratelimit-tokens-remaining")
+        retry_after = headers.get("retry-after")
+        with self.lock:
+            try:
+                if requests_remaining is not None:
+                    self.requests_available = min(self.requests_available, float(requests_remaining))
+                if tokens_remaining is not None:
+                    self.tokens_available = min(self.tokens_available, float(tokens_remaining))
+                if retry_after is not None:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + float(retry_after))
+            except ValueError:
+                logger.debug("Ignoring malformed rate limit headers")
+
+claude_rate_limiter = RateLimiter(CLAUDE_REQUESTS_PER_MINUTE, CLAUDE_TOKENS_PER_MINUTE)
+
+def estimate_input_tokens(text: str) -> int:
+    """Rough input token count for a request (about 4 characters per token)"""
+    return (len(ANALYST_INSTRUCTIONS) + len(text)) // 4
+
+# Model used for analyses; chat text shorter than CLAUDE_SMALL_MODEL_MAX_CHARS
+# goes to the faster, cheaper CLAUDE_MODEL_SMALL (set it empty to always use CLAUDE_MODEL)
+CLAUDE_MODEL = os.environ.get('CLAUDE_MODEL', 'claude-3-7-sonnet-20250219')
+CLAUDE_MODEL_SMALL = os.environ.get('CLAUDE_MODEL_SMALL', 'claude-3-5-haiku-latest')
+CLAUDE_SMALL_MODEL_MAX_CHARS = int(os.environ.get('CLAUDE_SMALL_MODEL_MAX_CHARS', 8000))
+
+def _analysis_model(text: str) -> str:
+    """Model to analyze text with, based on its length"""
+    if CLAUDE_MODEL_SMALL and len(text) < CLAUDE_SMALL_MODEL_MAX_CHARS:
+        return CLAUDE_MODEL_SMALL
+    return CLAUDE_MODEL
+
+# Bump when ANALYST_INSTRUCTIONS or the analysis tools change in a way that
+# changes the analyses, so cached results from the old prompt are not reused
+ANALYSIS_PROMPT_VERSION = "1"
+
+# Model settings and prompt version hashed into every analysis cache key
+_ANALYSIS_CACHE_KEY_PREFIX = (
+    f"{CLAUDE_MODEL}|{CLAUDE_MODEL_SMALL}|{CLAUDE_SMALL_MODEL_MAX_CHARS}|{ANALYSIS_PROMPT_VERSION}|"
+).encode('utf-8')
+
+# Successful analyses are cached on disk by a hash of the analyzed text, so
+# re-running an analysis (or uploading the same log twice) skips Claude
+CHUNK_CACHE_DIR = os.path.join(config.RESULTS_FOLDER, 'chunk_cache')
+
+# Cached analyses older than this (in seconds) are re-run; 0 keeps them forever
+CHUNK_CACHE_MAX_AGE = int(os.environ.get('CHUNK_CACHE_MAX_AGE', 30 * 24 * 60 * 60))
+
+def _analysis_cache_key(text: Union[str, bytes]) -> str:
+    """
+    Content hash used as the cache file name for an analyzed text (str or UTF-8 bytes)
+    
+    The model and prompt version are part of the key, so changing either
+    doesn't serve analyses produced under the old settings.
+    """
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+    digest = hashlib.blake2b(_ANALYSIS_CACHE_KEY_PREFIX, digest_size=16)
+    digest.update(text)
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=256)
+def _read_cached_analysis(cache_key: str, modified: float) -> bytes:
+    """Read a cache entry's raw JSON; an entry only changes when it's replaced, which changes modified"""
+    with open(os.path.join(CHUNK_CACHE_DIR, f"{cache_key}.json"), 'rb') as f:
+        return f.read()
+
+def get_cached_analysis(text: str, cache_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Return the cached Claude analysis for a text, or None on a cache miss
+    
+    A fresh dict is returned on every call since callers modify results.
+    Pass cache_key if it's already known to skip re-hashing the text.
+    Entries older than CHUNK_CACHE_MAX_AGE count as a miss; they are
+    replaced when the new analysis is stored.
+    """
+    if cache_key is None:
+        cache_key = _analysis_cache_key(text)
+    try:
+        modified = os.stat(os.path.join(CHUNK_CACHE_DIR, f"{cache_key}.json")).st_mtime
+    except OSError:
+        return None
+    if CHUNK_CACHE_MAX_AGE and time.time() - modified > CHUNK_CACHE_MAX_AGE:
+        return None
+    try:
+        return orjson.loads(_read_cached_analysis(cache_key, modified))
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable analysis cache entry {cache_key}: {str(e)}")
+        return None
+
+def _store_cached_analysis(text: str, analysis: Dict[str, Any], cache_key: Optional[str] = None) -> None:
+    """Write an analysis to the cache atomically"""
+    if cache_key is None:
+        cache_key = _analysis_cache_key(text)
+    cache_path = os.path.join(CHUNK_CACHE_DIR, f"{cache_key}.json")
+    try:
+        os.makedirs(CHUNK_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(analysis, option=orjson.OPT_NON_STR_KEYS))
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.warning(f"Could not write analysis cache entry {cache_key}: {str(e)}")
+
+def analyze_chunks(chunks: Iterable[Union[str, bytes]], api_key: str = None, use_mock: bool = False, max_chunks: int = None, chunks_per_call: int = None, use_batch_api: bool = None) -> List[Dict[str, Any]]:
     """
     Analyze text chunks using Claude AI and return analysis results
     
+    Chunks are pulled from the iterable lazily and only a small window is
+    in flight at once, so a generator (e.g. chat_processor.load_chunks_from_store)
+    keeps memory bounded regardless of the upload size. Chunks may be UTF-8
+    bytes (load_chunks_from_store(..., decode=False)); they are hashed as-is
+    and only decoded if they actually have to be sent to Claude.
+    
     Args:
-        chunks: List of text chunks to analyze
+        chunks: Iterable of text chunks (str or UTF-8 bytes) to analyze
         api_key: Claude API key (optional if use_mock is True)
         use_mock: If True, return mock data instead of calling Claude API
         max_chunks: Maximum number of chunks to analyze (default: None = all chunks)
+        chunks_per_call: Chunks sent to Claude per request (default: CLAUDE_CHUNKS_PER_CALL)
+        use_batch_api: Analyze through the Message Batches API (default: CLAUDE_USE_MESSAGE_BATCHES)
         
     Returns:
         List of analysis results, one for each chunk
     """
-    results = []
-    
     # If mock mode is enabled, return realistic mock data
     if use_mock:
         logger.info("Using mock data instead of calling Claude AI...")
@@ -33,43 +257,193 @@ def analyze_chunks(chunks: List[str], api_key: str = None, use_mock: bool = Fals
     if not api_key:
         raise ValueError("Claude API key is required when not using mock mode")
     
+    if use_batch_api is None:
+        use_batch_api = CLAUDE_USE_MESSAGE_BATCHES
+    if use_batch_api:
+        return analyze_chunks_batch(chunks, api_key, max_chunks)
+    
+    results = list(iter_chunk_analyses(chunks, api_key, max_chunks, chunks_per_call))
+    logger.info(f"Finished analysis of {len(results)} chunks")
+    return results
+
+def analyze_and_combine_chunks(chunks: Iterable[Union[str, bytes]], api_key: str = None, use_mock: bool = False, max_chunks: int = None, chunks_per_call: int = None) -> Dict[str, Any]:
+    """
+    Analyze text chunks and combine the results into a single analysis
+    
+    Each analysis is folded into the combined result as soon as it's ready, so
+    combining overlaps with the remaining Claude requests and per-chunk
+    results aren't kept in memory.
+    
+    Args:
+        chunks: Iterable of text chunks (str or UTF-8 bytes) to analyze
+        api_key: Claude API key (optional if use_mock is True)
+        use_mock: If True, return mock data instead of calling Claude API
+        max_chunks: Maximum number of chunks to analyze (default: None = all chunks)
+        chunks_per_call: Chunks sent to Claude per request (default: CLAUDE_CHUNKS_PER_CALL)
+        
+    Returns:
+        Combined analysis
+    """
+    if use_mock:
+        return combine_results(analyze_chunks(chunks, api_key, use_mock=True))
+    
+    if not api_key:
+        raise ValueError("Claude API key is required when not using mock mode")
+    
+    combiner = ResultCombiner()
+    for result in iter_chunk_analyses(chunks, api_key, max_chunks, chunks_per_call):
+        combiner.fold(result)
+    logger.info(f"Finished analysis of {combiner.result_count} chunks")
+    return combiner.finalize()
+
+def iter_chunk_analyses(chunks: Iterable[Union[str, bytes]], api_key: str, max_chunks: int = None, chunks_per_call: int = None) -> Iterator[Dict[str, Any]]:
+    """
+    Analyze text chunks concurrently, yielding each analysis in chunk order
+    
+    Args:
+        chunks: Iterable of text chunks (str or UTF-8 bytes) to analyze
+        api_key: Claude API key
+        max_chunks: Maximum number of chunks to analyze (default: None = all chunks)
+        chunks_per_call: Chunks sent to Claude per request (default: CLAUDE_CHUNKS_PER_CALL)
+        
+    Yields:
+        Analysis results, one for each chunk
+    """
     # Limit the number of chunks if specified
+    chunks_to_analyze = iter(chunks)
     if max_chunks is not None and max_chunks > 0:
-        logger.info(f"Limiting analysis to the first {max_chunks} chunks (out of {len(chunks)} total)")
-        chunks_to_analyze = chunks[:max_chunks]
-    else:
-        chunks_to_analyze = chunks
+        logger.info(f"Limiting analysis to the first {max_chunks} chunks")
+        chunks_to_analyze = islice(chunks_to_analyze, max_chunks)
     
-    logger.info(f"Starting analysis of {len(chunks_to_analyze)} chunks out of {len(chunks)} total chunks")
+    logger.info("Starting chunk analysis")
     
-    for i, chunk in enumerate(chunks_to_analyze):
-        logger.info(f"Analyzing chunk {i+1} of {len(chunks_to_analyze)}...")
-        
+    if not chunks_per_call or chunks_per_call < 1:
+        chunks_per_call = CLAUDE_CHUNKS_PER_CALL
+    
+    # Claude calls are network-bound, so dispatch batches of chunks to a worker
+    # pool. The semaphore caps in-flight requests to what the API key allows.
+    api_slots = threading.Semaphore(CLAUDE_MAX_CONCURRENCY)
+    
+    def analyze_indexed_batch(batch):
         try:
-            # Send to Claude for analysis and get results
-            analysis = analyze_with_claude(chunk, api_key)
-            logger.info(f"Analysis of chunk {i+1} completed successfully")
+            # Cache hits don't need to go to Claude
+            uncached = []
+            for i, chunk, cache_key, future in batch:
+                logger.info(f"Analyzing chunk {i+1}...")
+                analysis = get_cached_analysis(chunk, cache_key)
+                if analysis is not None:
+                    logger.debug("Using cached analysis for chunk %d", i + 1)
+                    future.set_result(analysis)
+                else:
+                    uncached.append((i, chunk, cache_key, future))
+            if not uncached:
+                return
             
-            # Debug: Log the structure of the analysis result
-            logger.info(f"Analysis result keys: {list(analysis.keys() if isinstance(analysis, dict) else [])}")
+            # Decode stored chunks only now that they have to go into a prompt
+            texts = [chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk for _, chunk, _, _ in uncached]
             
-            results.append(analysis)
+            # Send to Claude for analysis and get results
+            with api_slots:
+                analyses = analyze_batch_with_claude(texts, api_key, [cache_key for _, _, cache_key, _ in uncached])
             
-            # Avoid rate limiting
-            if i < len(chunks_to_analyze) - 1:
-                time.sleep(1)
+            for (i, _, _, future), analysis in zip(uncached, analyses):
+                logger.info(f"Analysis of chunk {i+1} completed successfully")
+                
+                # Debug: Log the structure of the analysis result
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Analysis result keys: %s", list(analysis.keys() if isinstance(analysis, dict) else []))
+                future.set_result(analysis)
                 
         except Exception as e:
-            error_msg = f"Error analyzing chunk {i+1}: {str(e)}"
-            logger.error(error_msg)
-            # Add partial result to maintain chunk order
-            results.append({
-                "error": str(e),
-                "chunk_index": i,
-                "partial_analysis": {}
-            })
+            for i, _, _, future in batch:
+                if future.done():
+                    continue
+                error_msg = f"Error analyzing chunk {i+1}: {str(e)}"
+                logger.error(error_msg)
+                # Add partial result to maintain chunk order
+                future.set_result({
+                    "error": str(e),
+                    "chunk_index": i,
+                    "partial_analysis": {}
+                })
     
-    return results
+    def reuse_indexed_chunk(i, first):
+        # Take the result of the identical chunk already in flight instead of
+        # sending the same text to Claude twice; copy so callers can modify results
+        future = Future()
+        
+        def copy_result(done):
+            analysis = done.result()
+            logger.debug("Chunk %d is identical to an earlier chunk, reusing its analysis", i + 1)
+            if "error" in analysis:
+                future.set_result({**analysis, "chunk_index": i})
+            else:
+                future.set_result(copy.deepcopy(analysis))
+        
+        first.add_done_callback(copy_result)
+        return future
+    
+    # Keep at most two batches per worker in flight. Results are yielded
+    # oldest first so they stay in chunk order; finished results behind a slow
+    # chunk are buffered (up to max_buffered) so new chunks keep being sent
+    max_pending = CLAUDE_MAX_CONCURRENCY * 2 * chunks_per_call
+    max_buffered = max_pending * 4
+    pending = deque()
+    in_flight = {}  # cache key -> future of the first pending chunk with that text
+    batch = []
+    batch_tokens = 0
+    
+    with ThreadPoolExecutor(max_workers=CLAUDE_MAX_CONCURRENCY) as executor:
+        def submit_batch():
+            nonlocal batch, batch_tokens
+            if batch:
+                executor.submit(analyze_indexed_batch, batch)
+                batch = []
+                batch_tokens = 0
+        
+        def collect_oldest():
+            # The oldest chunk may still be waiting for its batch to fill up
+            submit_batch()
+            cache_key, future = pending.popleft()
+            if in_flight.get(cache_key) is future:
+                del in_flight[cache_key]
+            return future.result()
+        
+        def collect_ready():
+            while pending and pending[0][1].done():
+                yield collect_oldest()
+        
+        for i, chunk in enumerate(chunks_to_analyze):
+            # Hash each chunk once; the key is reused for the cache lookup and store
+            cache_key = _analysis_cache_key(chunk)
+            first = in_flight.get(cache_key)
+            if first is None:
+                future = Future()
+                # Start a new batch rather than go over the input token budget
+                chunk_tokens = len(chunk) // 4
+                if batch_tokens + chunk_tokens > CLAUDE_BATCH_MAX_INPUT_TOKENS:
+                    submit_batch()
+                batch.append((i, chunk, cache_key, future))
+                batch_tokens += chunk_tokens
+                if len(batch) >= chunks_per_call:
+                    submit_batch()
+                in_flight[cache_key] = future
+            else:
+                future = reuse_indexed_chunk(i, first)
+            pending.append((cache_key, future))
+            yield from collect_ready()
+            if len(pending) >= max_pending:
+                submit_batch()
+                running = [f for _, f in pending if not f.done()]
+                if len(pending) >= max_buffered:
+                    yield collect_oldest()
+                elif len(running) >= max_pending:
+                    # Wait for any request to finish, not just the oldest
+                    wait(running, return_when=FIRST_COMPLETED)
+                yield from collect_ready()
+        
+        while pending:
+            yield collect_oldest()
 
 def generate_mock_analysis() -> Dict[str, Any]:
     """Generate realistic mock analysis data for demonstration"""
@@ -286,246 +660,654 @@ def generate_mock_analysis() -> Dict[str, Any]:
         }
     }
 
-def analyze_with_claude(text: str, api_key: str) -> Dict[str, Any]:
+# Static analyst instructions, sent as a cached system prompt so only the chat
+# text of each request is processed as new input
+ANALYST_INSTRUCTIONS = """\
+You are an expert conversation analyst. I will provide you with chat logs from a product called HitCraft, which appears to be a music production and songwriting assistant.
+
+The user message contains a sample of chat logs.
+
+Please analyze these conversations and provide insights in the following JSON format:
+
+1. "categories": List the main categories of conversations you observe (e.g., song production, music theory, etc.)
+
+2. "top_discussions": Identify the top 5 most common discussion topics, each containing:
+   - "topic": The topic name
+   - "count": How many times this topic appears
+   - "instances": Array of 2-3 excerpts from the chat logs that are examples of this topic, each with:
+      - "context": The relevant conversation text showing this topic
+
+3. "response_quality": Evaluate the quality of the assistant's responses (scale 1-10) with specific examples of good and poor responses
+
+4. "improvement_areas": Identify specific areas where the product could be improved based on user interactions, with each area including:
+   - "area": The improvement area
+   - "supporting_evidence": Array of 1-3 excerpts from the chat logs that demonstrate this need for improvement
+
+5. "user_satisfaction": Gauge overall user satisfaction based on conversation flow and user engagement
+
+6. "unmet_needs": Identify cases where users didn't get what they wanted, with each need including:
+   - "need": The unmet need
+   - "supporting_evidence": Array of 1-3 excerpts from the chat logs that demonstrate this unmet need
+
+7. "product_effectiveness": Assess how well the product delivers on its promise as a music production/songwriting assistant
+
+8. "key_insights": List 3-5 key insights from your analysis, with each insight including:
+   - "insight": The key insight
+   - "supporting_evidence": Array of 1-3 excerpts from the chat logs that support this insight
+
+9. "negative_chats": Categorize conversations where users express dissatisfaction, organized by issue type:
+   - "categories": Array of objects, each containing:
+      - "category": Name of the issue category (e.g., "Feature Unavailable", "Accuracy Problems", "Technical Issues")
+      - "count": Number of conversations in this category
+      - "examples": Array of excerpts from conversations showing this issue, each with:
+         - "context": The conversation text showing user dissatisfaction
+
+Important: For each supporting_evidence item or instance context, please include the exact text from the conversation, prefixed with the conversation position (e.g., "Conversation #3: ...").
+
+Return the analysis by calling the provided tool.
+"""
+
+# Top-level fields every analysis has, in output order; missing ones are filled
+# with an empty object (DICT_FIELDS) or an empty list
+REQUIRED_FIELDS = (
+    "categories", "top_discussions", "response_quality",
+    "improvement_areas", "user_satisfaction", "unmet_needs",
+    "product_effectiveness", "key_insights", "negative_chats"
+)
+REQUIRED_FIELD_SET = frozenset(REQUIRED_FIELDS)
+DICT_FIELDS = frozenset(("response_quality", "user_satisfaction", "product_effectiveness"))
+
+def _evidence_list_schema(item_name: str) -> Dict[str, Any]:
+    """Schema for a list of {item_name, supporting_evidence} objects"""
+    return {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                item_name: {"type": "string"},
+                "supporting_evidence": {"type": "array", "items": {"type": "string"}}
+            },
+            "required": [item_name]
+        }
+    }
+
+_CONTEXT_LIST_SCHEMA = {
+    "type": "array",
+    "items": {"type": "object", "properties": {"context": {"type": "string"}}, "required": ["context"]}
+}
+
+# Claude is forced to answer through this tool, so the analysis arrives as the
+# tool's JSON input instead of free text that has to be dug out of markdown
+ANALYSIS_TOOL = {
+    "name": "emit_analysis",
+    "description": "Record the structured analysis of the chat logs.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "categories": {"type": "array", "items": {"type": "string"}},
+            "top_discussions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "topic": {"type": "string"},
+                        "count": {"type": "integer"},
+                        "instances": _CONTEXT_LIST_SCHEMA
+                    },
+                    "required": ["topic"]
+                }
+            },
+            "response_quality": {"type": "object"},
+            "improvement_areas": _evidence_list_schema("area"),
+            "user_satisfaction": {"type": "object"},
+            "unmet_needs": _evidence_list_schema("need"),
+            "product_effectiveness": {"type": "object"},
+            "key_insights": _evidence_list_schema("insight"),
+            "negative_chats": {
+                "type": "object",
+                "properties": {
+                    "categories": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "category": {"type": "string"},
+                                "count": {"type": "integer"},
+                                "examples": _CONTEXT_LIST_SCHEMA
+                            },
+                            "required": ["category"]
+                        }
+                    }
+                }
+            }
+        },
+        "required": list(REQUIRED_FIELDS)
+    }
+}
+
+# Request fields shared by every analysis request, built once at import
+ANALYSIS_REQUEST_BASE = {
+    "model": CLAUDE_MODEL,
+    "max_tokens": 4000,
+    "temperature": 0.0,  # We want deterministic, analytical responses
+    "stream": True,  # Receive the text as it's generated
+    "tools": [ANALYSIS_TOOL],
+    "tool_choice": {"type": "tool", "name": ANALYSIS_TOOL["name"]},
+    "system": [{
+        "type": "text",
+        "text": ANALYST_INSTRUCTIONS,
+        "cache_control": {"type": "ephemeral"}
+    }]
+}
+CHAT_LOG_PREFIX = "Here is a sample of chat logs:\n\n```\n"
+CHAT_LOG_SUFFIX = "\n```"
+
+# Several small chunks can share one request; Claude returns one analysis per
+# chunk through this tool, so the instructions are only sent once per batch
+BATCH_ANALYSIS_TOOL = {
+    "name": "emit_analyses",
+    "description": "Record the structured analysis of each chunk of chat logs, in chunk id order.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "analyses": {"type": "array", "items": ANALYSIS_TOOL["input_schema"]}
+        },
+        "required": ["analyses"]
+    }
+}
+BATCH_ANALYSIS_REQUEST_BASE = {
+    **ANALYSIS_REQUEST_BASE,
+    "tools": [BATCH_ANALYSIS_TOOL],
+    "tool_choice": {"type": "tool", "name": BATCH_ANALYSIS_TOOL["name"]}
+}
+CHUNK_BATCH_PREFIX = (
+    "Here are {count} separate samples of chat logs, each wrapped in a <chunk> tag. "
+    "Analyze each chunk on its own and return exactly one analysis per chunk, in chunk id order.\n\n"
+)
+
+# Output tokens reserved for any analysis, plus one per ANALYSIS_CHARS_PER_OUTPUT_TOKEN
+# characters of chat text, up to the max_tokens of ANALYSIS_REQUEST_BASE
+ANALYSIS_MIN_OUTPUT_TOKENS = 800
+ANALYSIS_CHARS_PER_OUTPUT_TOKEN = 10
+
+def _analysis_max_tokens(text: str) -> int:
+    """Output token budget for analyzing text, so short chunks don't reserve the full budget"""
+    return min(ANALYSIS_REQUEST_BASE["max_tokens"],
+               ANALYSIS_MIN_OUTPUT_TOKENS + len(text) // ANALYSIS_CHARS_PER_OUTPUT_TOKEN)
+
+@functools.lru_cache(maxsize=4)
+def _claude_headers(api_key: str) -> Dict[str, str]:
+    """Per-key request headers; Content-Type and anthropic-version are set on claude_session"""
+    return {"x-api-key": api_key}
+
+def read_streamed_content(response: requests.Response) -> Tuple[str, str, Optional[str]]:
+    """
+    Collect the content of a streamed (server-sent events) Messages API response
+    
+    Deltas are gathered as they arrive, so the read timeout applies per event
+    rather than to the whole generation.
+    
+    Args:
+        response: Successful response of a request sent with "stream": True
+        
+    Returns:
+        Tuple of (text of the text blocks, JSON input of the first tool_use block, stop reason)
+    
+    Raises:
+        RuntimeError: If the stream reports an error
+    """
+    text_parts = []
+    tool_parts = []
+    tool_index = None
+    usage = {}
+    stop_reason = None
+    try:
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            event = orjson.loads(line[5:])
+            event_type = event.get("type")
+            if event_type == "content_block_delta":
+                delta = event.get("delta", {})
+                delta_type = delta.get("type")
+                if delta_type == "text_delta":
+                    text_parts.append(delta.get("text", ""))
+                elif delta_type == "input_json_delta" and event.get("index") == tool_index:
+                    tool_parts.append(delta.get("partial_json", ""))
+            elif event_type == "content_block_start":
+                block = event.get("content_block", {})
+                if block.get("type") == "tool_use" and tool_index is None:
+                    tool_index = event.get("index")
+                elif block.get("text"):
+                    text_parts.append(block["text"])
+            elif event_type == "message_start":
+                usage.update(event.get("message", {}).get("usage") or {})
+            elif event_type == "message_delta":
+                usage.update(event.get("usage") or {})
+                stop_reason = event.get("delta", {}).get("stop_reason") or stop_reason
+            elif event_type == "error":
+                raise RuntimeError(f"Claude stream error: {event.get('error', {}).get('message', 'Unknown error')}")
+    finally:
+        response.close()
+    
+    # Token usage, to tune max_tokens and check that prompt caching is working
+    logger.debug("Claude usage: %s input tokens (%s read from cache), %s output tokens, stop reason: %s",
+                 usage.get('input_tokens'), usage.get('cache_read_input_tokens') or 0,
+                 usage.get('output_tokens'), stop_reason)
+    return "".join(text_parts), "".join(tool_parts), stop_reason
+
+def analyze_with_claude(text: str, api_key: str, cache_key: Optional[str] = None) -> Dict[str, Any]:
     """
     Send text to Claude AI for analysis
     
     Args:
         text: Text content to analyze
         api_key: Claude API key
+        cache_key: Cache key of text, if the caller has already computed it
+            and found no cached analysis under it
         
     Returns:
         Analysis results from Claude
     """
-    headers = {
-        "x-api-key": api_key,
-        "Content-Type": "application/json",
-        "anthropic-version": "2023-06-01"  # Using the Anthropic API version, update as needed
-    }
+    headers = _claude_headers(api_key)
     
     # Log API key status (masked for privacy)
     if api_key:
         masked_key = api_key[:4] + "..." + api_key[-4:]
-        logger.info(f"Using Claude API key: {masked_key}")
+        logger.debug("Using Claude API key: %s", masked_key)
     else:
         logger.error("No Claude API key provided")
         logger.warning("USING MOCK DATA due to missing API key")
         return generate_mock_analysis()
     
-    prompt = f"""
-    You are an expert conversation analyst. I will provide you with chat logs from a product called HitCraft, which appears to be a music production and songwriting assistant. 
+    # A caller that passes cache_key has already looked it up in the cache
+    if cache_key is None:
+        cache_key = _analysis_cache_key(text)
+        cached = get_cached_analysis(text, cache_key)
+        if cached is not None:
+            logger.debug("Using cached Claude analysis")
+            return cached
     
-    Here is a sample of chat logs:
+    # Only the chat text and its output budget change between requests
+    data = {
+        **ANALYSIS_REQUEST_BASE,
+        "model": _analysis_model(text),
+        "max_tokens": _analysis_max_tokens(text),
+        "messages": [{"role": "user", "content": CHAT_LOG_PREFIX + text + CHAT_LOG_SUFFIX}]
+    }
     
-    ```
-    {text}
-    ```
+    try:
+        streamed = _send_analysis_request(data, headers, text)
+        if streamed is None:
+            logger.warning("USING MOCK DATA due to Claude API error")
+            return generate_mock_analysis()  # Use mock data on API error
+        
+        _, tool_input, stop_reason = streamed
+        
+        # The output budget is sized to the chunk; if the analysis didn't fit,
+        # retry once with the full budget rather than losing the analysis
+        if stop_reason == "max_tokens" and data["max_tokens"] < ANALYSIS_REQUEST_BASE["max_tokens"]:
+            logger.warning(f"Claude analysis was cut off at {data['max_tokens']} tokens, retrying with {ANALYSIS_REQUEST_BASE['max_tokens']}")
+            data["max_tokens"] = ANALYSIS_REQUEST_BASE["max_tokens"]
+            streamed = _send_analysis_request(data, headers, text)
+            if streamed is None:
+                logger.warning("USING MOCK DATA due to Claude API error")
+                return generate_mock_analysis()
+            _, tool_input, stop_reason = streamed
+        
+        logger.debug("Successfully received response from Claude API")
+        
+        # tool_choice forces the emit_analysis tool, so the analysis arrives as
+        # the tool's JSON input and any text blocks can be ignored
+        if not tool_input:
+            logger.error("No emit_analysis tool input in Claude response")
+            logger.warning("USING MOCK DATA due to missing content in Claude response")
+            return generate_mock_analysis()
+            
+        logger.debug("Response content length: %d", len(tool_input))
+        
+        try:
+            analysis_result = orjson.loads(tool_input)
+            logger.debug("Successfully parsed JSON")
+        except orjson.JSONDecodeError as e:
+            logger.error(f"Error parsing JSON: {str(e)}")
+            logger.error("JSON string preview: %s...", tool_input[:300])
+            # Return mock data instead of failing
+            logger.warning("USING MOCK DATA due to JSON decode error")
+            return generate_mock_analysis()
+        
+        _complete_analysis(analysis_result)
+        logger.debug("Successfully normalized Claude analysis result")
+        _store_cached_analysis(text, analysis_result, cache_key)
+        return analysis_result
     
-    Please analyze these conversations and provide insights in the following JSON format:
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error calling Claude API: {str(e)}")
+        logger.warning("USING MOCK DATA due to request exception")
+        return generate_mock_analysis()
+    except Exception as e:
+        logger.error(f"Unexpected error in analyze_with_claude: {str(e)}")
+        logger.error(traceback.format_exc())
+        logger.warning("USING MOCK DATA due to unexpected error")
+        return generate_mock_analysis()
+
+def analyze_batch_with_claude(texts: List[str], api_key: str, cache_keys: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Send several texts to Claude AI in one request, one analysis per text
     
-    1. "categories": List the main categories of conversations you observe (e.g., song production, music theory, etc.)
+    The instructions and network round trip are paid once for the whole batch.
+    Texts are analyzed by the same model as on their own, so texts for
+    different models go in separate requests. If Claude's answer doesn't line
+    up with the chunks, each text is analyzed on its own instead.
     
-    2. "top_discussions": Identify the top 5 most common discussion topics, each containing:
-       - "topic": The topic name
-       - "count": How many times this topic appears
-       - "instances": Array of 2-3 excerpts from the chat logs that are examples of this topic, each with:
-          - "context": The relevant conversation text showing this topic
-
-    3. "response_quality": Evaluate the quality of the assistant's responses (scale 1-10) with specific examples of good and poor responses
+    Args:
+        texts: Text contents to analyze
+        api_key: Claude API key
+        cache_keys: Cache keys of texts, if the caller has already computed them
+            and found no cached analyses under them
+        
+    Returns:
+        Analysis results from Claude, one for each text
+    """
+    # Texts analyzed one by one are looked up in the cache first, unless the
+    # caller already did that
+    keys_checked = cache_keys is not None
+    lookup_keys = cache_keys if keys_checked else [None] * len(texts)
+    if len(texts) == 1 or not api_key:
+        return [analyze_with_claude(text, api_key, cache_key) for text, cache_key in zip(texts, lookup_keys)]
     
-    4. "improvement_areas": Identify specific areas where the product could be improved based on user interactions, with each area including:
-       - "area": The improvement area
-       - "supporting_evidence": Array of 1-3 excerpts from the chat logs that demonstrate this need for improvement
+    def analyze_subset(indices):
+        return analyze_batch_with_claude([texts[i] for i in indices], api_key,
+                                         [cache_keys[i] for i in indices] if keys_checked else None)
     
-    5. "user_satisfaction": Gauge overall user satisfaction based on conversation flow and user engagement
+    # A cache key stands for the model _analysis_model picks for its text
+    models = [_analysis_model(text) for text in texts]
+    if len(set(models)) > 1:
+        analyses = [None] * len(texts)
+        for model in dict.fromkeys(models):
+            indices = [i for i, text_model in enumerate(models) if text_model == model]
+            for i, analysis in zip(indices, analyze_subset(indices)):
+                analyses[i] = analysis
+        return analyses
     
-    6. "unmet_needs": Identify cases where users didn't get what they wanted, with each need including:
-       - "need": The unmet need
-       - "supporting_evidence": Array of 1-3 excerpts from the chat logs that demonstrate this unmet need
+    if not keys_checked:
+        cache_keys = [_analysis_cache_key(text) for text in texts]
     
-    7. "product_effectiveness": Assess how well the product delivers on its promise as a music production/songwriting assistant
+    content = CHUNK_BATCH_PREFIX.format(count=len(texts)) + "\n".join(
+        f'<chunk id="{i}">\n{text}\n</chunk>' for i, text in enumerate(texts)
+    )
+    data = {
+        **BATCH_ANALYSIS_REQUEST_BASE,
+        "model": models[0],
+        # Leave each chunk as much room for its analysis as a single request
+        "max_tokens": sum(_analysis_max_tokens(text) for text in texts),
+        "messages": [{"role": "user", "content": content}]
+    }
     
-    8. "key_insights": List 3-5 key insights from your analysis, with each insight including:
-       - "insight": The key insight
-       - "supporting_evidence": Array of 1-3 excerpts from the chat logs that support this insight
+    try:
+        streamed = _send_analysis_request(data, _claude_headers(api_key), content)
+        if streamed is None:
+            logger.warning("USING MOCK DATA due to Claude API error")
+            return [generate_mock_analysis() for _ in texts]
+        
+        _, tool_input, stop_reason = streamed
+        
+        # A batch cut off at max_tokens can't be parsed; halve it rather than
+        # sending every chunk on its own
+        if stop_reason == "max_tokens":
+            logger.warning(f"Batched analysis of {len(texts)} chunks was cut off at {data['max_tokens']} tokens, splitting the batch")
+            middle = len(texts) // 2
+            return analyze_subset(range(middle)) + analyze_subset(range(middle, len(texts)))
+        
+        analyses = orjson.loads(tool_input or "{}").get("analyses")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error calling Claude API: {str(e)}")
+        logger.warning("USING MOCK DATA due to request exception")
+        return [generate_mock_analysis() for _ in texts]
+    except Exception as e:
+        logger.error(f"Error reading batched Claude analysis: {str(e)}")
+        analyses = None
     
-    9. "negative_chats": Categorize conversations where users express dissatisfaction, organized by issue type:
-       - "categories": Array of objects, each containing:
-          - "category": Name of the issue category (e.g., "Feature Unavailable", "Accuracy Problems", "Technical Issues")
-          - "count": Number of conversations in this category
-          - "examples": Array of excerpts from conversations showing this issue, each with:
-             - "context": The conversation text showing user dissatisfaction
+    if not isinstance(analyses, list) or len(analyses) != len(texts) or not all(isinstance(a, dict) for a in analyses):
+        logger.warning(f"Batched analysis of {len(texts)} chunks didn't match the chunks, analyzing them one by one")
+        return [analyze_with_claude(text, api_key, cache_key) for text, cache_key in zip(texts, lookup_keys)]
     
-    Important: For each supporting_evidence item or instance context, please include the exact text from the conversation, prefixed with the conversation position (e.g., "Conversation #3: ...").
+    logger.info(f"Successfully received batched analysis of {len(texts)} chunks")
+    for text, analysis, cache_key in zip(texts, analyses, cache_keys):
+        _complete_analysis(analysis)
+        _store_cached_analysis(text, analysis, cache_key)
+    return analyses
+
+def _send_analysis_request(data: Dict[str, Any], headers: Dict[str, str], text: str) -> Optional[Tuple[str, str, Optional[str]]]:
+    """
+    Post an analysis request to Claude and read the streamed response
     
-    Return only valid JSON. The entire response should be parseable as JSON.
+    Args:
+        data: Request body
+        headers: Request headers from _claude_headers
+        text: Chat text included in the request, used to estimate its tokens
+        
+    Returns:
+        Tuple of (text content, tool input JSON, stop reason), or None if the API returned an error status
     """
+    # Wait for room under the account's request and token rate limits
+    claude_rate_limiter.acquire(estimate_input_tokens(text))
     
-    data = {
-        "model": "claude-3-7-sonnet-20240307",  # Using Claude 3.7 Sonnet
-        "max_tokens": 4000,
-        "temperature": 0.0,  # We want deterministic, analytical responses
-        "messages": [{"role": "user", "content": prompt}]
-    }
+    logger.debug("Sending request to Claude API (model %s)...", data["model"])
+    response = claude_session.post(
+        CLAUDE_API_URL,
+        headers=headers,
+        data=orjson.dumps(data),
+        stream=True,
+        timeout=120  # Allow up to 2 minutes between streamed events
+    )
+    claude_rate_limiter.update_from_headers(response.headers)
     
+    if not response.ok:
+        logger.error(f"Claude API returned status code {response.status_code}")
+        body = _read_error_body(response)
+        logger.error(f"Response content: {body.decode('utf-8', 'replace')}")
+        if b"error" in body:
+            try:
+                error_data = orjson.loads(body)
+                logger.error(f"API Error: {error_data.get('error', {}).get('message', 'Unknown error')}")
+            except:
+                pass
+        return None
+    
+    return read_streamed_content(response)
+
+# Error responses are only read this far before the connection is dropped
+ERROR_BODY_PREVIEW_BYTES = 2048
+
+def _read_error_body(response: requests.Response) -> bytes:
+    """Read the start of a streamed error response and close it without draining the rest"""
     try:
-        logger.info("Sending request to Claude API...")
-        response = requests.post(
-            "https://api.anthropic.com/v1/messages",
-            headers=headers,
-            json=data,
-            timeout=120  # Allow up to 2 minutes for response
-        )
+        return response.raw.read(ERROR_BODY_PREVIEW_BYTES, decode_content=True) or b""
+    except Exception as e:
+        logger.debug("Could not read error response body: %s", e)
+        return b""
+    finally:
+        response.close()
+
+def _normalize_keyed_list(items: Iterable[Any], primary_key: str, fallback_key: str = 'key') -> List[Dict[str, Any]]:
+    """
+    Normalize a list of analysis items so each one is a dict with primary_key set
+    
+    Dict items are updated in place rather than copied; strings are wrapped and
+    anything else is dropped.
+    
+    Args:
+        items: Items from the analysis, e.g. key_insights
+        primary_key: Field every item must have, e.g. "insight"
+        fallback_key: Field to take the value from when primary_key is missing
         
-        if not response.ok:
-            logger.error(f"Claude API returned status code {response.status_code}")
-            logger.error(f"Response content: {response.text}")
-            if "error" in response.text:
-                try:
-                    error_data = json.loads(response.text)
-                    logger.error(f"API Error: {error_data.get('error', {}).get('message', 'Unknown error')}")
-                except:
-                    pass
-            logger.warning("USING MOCK DATA due to Claude API error")
-            return generate_mock_analysis()  # Use mock data on API error
+    Returns:
+        Normalized list of items
+    """
+    normalized = []
+    append = normalized.append
+    for item in items:
+        if isinstance(item, str):
+            append({primary_key: item})
+        elif isinstance(item, dict):
+            # Handle case where the value is under fallback_key or missing completely
+            if primary_key not in item:
+                if fallback_key in item:
+                    item[primary_key] = item[fallback_key]
+                elif item:
+                    # Just use the first field as the value
+                    first_key = next(iter(item))
+                    item[primary_key] = f"{first_key}: {item[first_key]}"
+                else:
+                    item[primary_key] = f"Unknown {primary_key}"
+            append(item)
+    return normalized
+
+def _complete_analysis(analysis_result: Dict[str, Any]) -> None:
+    """Fill in missing fields of a parsed analysis and normalize its insights and improvement areas in place"""
+    # Verify the result contains all required fields
+    if not REQUIRED_FIELD_SET.issubset(analysis_result):
+        missing_fields = [field for field in REQUIRED_FIELDS if field not in analysis_result]
+        logger.warning(f"Analysis result is missing fields: {missing_fields}")
+        # Fill in any missing fields with empty values
+        for field in missing_fields:
+            analysis_result[field] = {} if field in DICT_FIELDS else []
+    
+    # Normalize key_insights and improvement_areas to avoid KeyError: 'key'
+    if 'key_insights' in analysis_result:
+        analysis_result['key_insights'] = _normalize_keyed_list(analysis_result['key_insights'], 'insight')
+    if 'improvement_areas' in analysis_result:
+        analysis_result['improvement_areas'] = _normalize_keyed_list(analysis_result['improvement_areas'], 'area')
+
+def analyze_chunks_batch(chunks: Iterable[Union[str, bytes]], api_key: str, max_chunks: int = None) -> List[Dict[str, Any]]:
+    """
+    Analyze text chunks with one Message Batches API job
+    
+    Batched requests cost half as much and don't count against the per-minute
+    rate limits, but finish asynchronously, so the job is polled until it ends.
+    Cached chunks are served from the cache and identical chunks are only sent
+    once. With too few chunks left to send, if the job can't be created, or if
+    it doesn't end within MESSAGE_BATCH_MAX_WAIT seconds, the chunks are
+    analyzed with direct requests instead.
+    
+    Args:
+        chunks: Iterable of text chunks (str or UTF-8 bytes) to analyze
+        api_key: Claude API key
+        max_chunks: Maximum number of chunks to analyze (default: None = all chunks)
         
-        result = response.json()
-        logger.info("Successfully received response from Claude API")
+    Returns:
+        List of analysis results, one for each chunk
+    """
+    chunks = list(islice(chunks, max_chunks) if max_chunks is not None and max_chunks > 0 else chunks)
+    results = [None] * len(chunks)
+    
+    # cache key -> (text, indexes of the chunks with that text)
+    to_send = {}
+    for i, chunk in enumerate(chunks):
+        cache_key = _analysis_cache_key(chunk)
+        if cache_key in to_send:
+            to_send[cache_key][1].append(i)
+            continue
+        cached = get_cached_analysis(chunk, cache_key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            to_send[cache_key] = (chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk, [i])
+    
+    if len(to_send) < MESSAGE_BATCH_MIN_CHUNKS:
+        return analyze_chunks(chunks, api_key, use_batch_api=False)
+    
+    headers = _claude_headers(api_key)
+    params_base = {key: value for key, value in ANALYSIS_REQUEST_BASE.items() if key != "stream"}
+    batch_requests = [{
+        "custom_id": cache_key,
+        "params": {
+            **params_base,
+            "model": _analysis_model(text),
+            "max_tokens": _analysis_max_tokens(text),
+            "messages": [{"role": "user", "content": CHAT_LOG_PREFIX + text + CHAT_LOG_SUFFIX}]
+        }
+    } for cache_key, (text, _) in to_send.items()]
+    
+    try:
+        response = claude_session.post(CLAUDE_BATCHES_URL, headers=headers,
+                                       data=orjson.dumps({"requests": batch_requests}), stream=True, timeout=120)
+        if not response.ok:
+            body = _read_error_body(response)
+            logger.error(f"Claude batch API returned status code {response.status_code}: {body.decode('utf-8', 'replace')}")
+            return analyze_chunks(chunks, api_key, use_batch_api=False)
+        batch = orjson.loads(response.content)
+        logger.info(f"Submitted message batch {batch['id']} with {len(batch_requests)} chunks")
         
-        # Extract the content from Claude's response
-        if 'content' not in result or not result['content']:
-            logger.error("No content in Claude response")
-            logger.warning("USING MOCK DATA due to missing content in Claude response")
-            return generate_mock_analysis()
-            
-        content = result['content'][0]['text']
-        logger.info(f"Response content length: {len(content)}")
+        # Wait for every request in the batch to finish, but don't hold this
+        # worker for the API's whole 24 hour batch window
+        deadline = time.monotonic() + MESSAGE_BATCH_MAX_WAIT
+        while batch.get("processing_status") != "ended":
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Message batch {batch['id']} didn't end within {MESSAGE_BATCH_MAX_WAIT} seconds, "
+                               f"canceling it and analyzing the chunks directly")
+                try:
+                    claude_session.post(f"{CLAUDE_BATCHES_URL}/{batch['id']}/cancel", headers=headers, timeout=60).close()
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"Could not cancel message batch {batch['id']}: {str(e)}")
+                return analyze_chunks(chunks, api_key, use_batch_api=False)
+            time.sleep(min(MESSAGE_BATCH_POLL_SECONDS, remaining))
+            response = claude_session.get(f"{CLAUDE_BATCHES_URL}/{batch['id']}", headers=headers, timeout=60)
+            response.raise_for_status()
+            batch = orjson.loads(response.content)
+            logger.info(f"Message batch {batch['id']} status: {batch.get('processing_status')} {batch.get('request_counts')}")
         
-        # Try to parse the JSON from the response
+        # Results are JSONL, one line per request, in no particular order
+        response = claude_session.get(batch["results_url"], headers=headers, stream=True, timeout=120)
+        response.raise_for_status()
         try:
-            # Handle case where Claude adds text before the JSON
-            # Look for the first { character to start parsing JSON
-            json_start = content.find('{')
-            if json_start >= 0:
-                logger.info(f"Found JSON starting at position {json_start}")
-                # Find the matching closing brace
-                json_content = content[json_start:]
-                # Make sure we have the complete JSON by finding balanced braces
-                open_braces = 0
-                close_braces = 0
-                for char in json_content:
-                    if char == '{':
-                        open_braces += 1
-                    elif char == '}':
-                        close_braces += 1
-                
-                logger.info(f"JSON has {open_braces} opening braces and {close_braces} closing braces")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                entry = orjson.loads(line)
+                cache_key = entry.get("custom_id")
+                if cache_key not in to_send:
+                    continue
+                text, indexes = to_send.pop(cache_key)
+                result = entry.get("result", {})
+                analysis = None
+                if result.get("type") == "succeeded":
+                    for block in result.get("message", {}).get("content", []):
+                        if block.get("type") == "tool_use" and isinstance(block.get("input"), dict):
+                            analysis = block["input"]
+                            break
+                if analysis is None:
+                    error = f"Message batch request {result.get('type', 'failed')}: {result.get('error', {})}"
+                    logger.error(error)
+                    for i in indexes:
+                        results[i] = {"error": error, "chunk_index": i, "partial_analysis": {}}
+                    continue
                 
-                if open_braces > 0 and open_braces == close_braces:
-                    logger.info("JSON structure appears balanced")
-                    json_str = json_content
-                else:
-                    logger.warning("JSON structure appears unbalanced, using default extraction")
-                    # Fall back to previous methods
-                    if "```json" in content:
-                        logger.info("Extracting JSON from markdown code block (```json)")
-                        json_str = content.split("```json")[1].split("```")[0].strip()
-                    elif "```" in content:
-                        logger.info("Extracting JSON from markdown code block (```)")
-                        json_str = content.split("```")[1].strip()
-                    else:
-                        logger.info("Using raw content as JSON")
-                        json_str = content.strip()
-            else:
-                # No JSON found, try other extraction methods
-                if "```json" in content:
-                    logger.info("Extracting JSON from markdown code block (```json)")
-                    json_str = content.split("```json")[1].split("```")[0].strip()
-                elif "```" in content:
-                    logger.info("Extracting JSON from markdown code block (```)")
-                    json_str = content.split("```")[1].strip()
-                else:
-                    logger.info("Using raw content as JSON")
-                    json_str = content.strip()
-            
-            logger.info(f"JSON string length: {len(json_str)}")
-            logger.info(f"JSON string preview: {json_str[:300]}...")
-            
-            try:
-                analysis_result = json.loads(json_str)
-                logger.info("Successfully parsed JSON")
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parsing JSON: {str(e)}")
-                # Return mock data instead of failing
-                logger.warning("USING MOCK DATA due to JSON decode error")
-                return generate_mock_analysis()
-        
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error calling Claude API: {str(e)}")
-            logger.warning("USING MOCK DATA due to request exception")
-            # Return mock data on request error
-            return generate_mock_analysis()
-        except Exception as e:
-            logger.error(f"Unexpected error in analyze_with_claude: {str(e)}")
-            logger.error(traceback.format_exc())
-            logger.warning("USING MOCK DATA due to unexpected error")
-            return generate_mock_analysis()
-        
-        # Verify the result contains all required fields
-        required_fields = ["categories", "top_discussions", "response_quality", 
-                         "improvement_areas", "user_satisfaction", "unmet_needs", 
-                         "product_effectiveness", "key_insights", "negative_chats"]
-        
-        missing_fields = [field for field in required_fields if field not in analysis_result]
-        if missing_fields:
-            logger.warning(f"Analysis result is missing fields: {missing_fields}")
-            # Fill in any missing fields with empty values
-            for field in missing_fields:
-                if field in ["response_quality", "user_satisfaction", "product_effectiveness"]:
-                    analysis_result[field] = {}
-                else:
-                    analysis_result[field] = []
-        
-        # Normalize key_insights structure to avoid KeyError: 'key'
-        if 'key_insights' in analysis_result:
-            normalized_insights = []
-            for insight in analysis_result['key_insights']:
-                if isinstance(insight, str):
-                    normalized_insights.append({"insight": insight})
-                elif isinstance(insight, dict):
-                    # Handle case where insight is under "key" or missing completely
-                    if 'insight' not in insight:
-                        if 'key' in insight:
-                            insight['insight'] = insight['key']
-                        elif len(insight) > 0:
-                            # Just use the first item as the insight
-                            first_key = list(insight.keys())[0]
-                            insight['insight'] = f"{first_key}: {insight[first_key]}"
-                        else:
-                            insight['insight'] = "Unknown insight"
-                    normalized_insights.append(insight)
-            analysis_result['key_insights'] = normalized_insights
-            
-        # Same for improvement areas
-        if 'improvement_areas' in analysis_result:
-            normalized_areas = []
-            for area in analysis_result['improvement_areas']:
-                if isinstance(area, str):
-                    normalized_areas.append({"area": area})
-                elif isinstance(area, dict):
-                    if 'area' not in area:
-                        if 'key' in area:
-                            area['area'] = area['key']
-                        elif len(area) > 0:
-                            first_key = list(area.keys())[0]
-                            area['area'] = f"{first_key}: {area[first_key]}"
-                        else:
-                            area['area'] = "Unknown area"
-                    normalized_areas.append(area)
-            analysis_result['improvement_areas'] = normalized_areas
-        
-        logger.info("Successfully normalized Claude analysis result")
-        return analysis_result
+                _complete_analysis(analysis)
+                _store_cached_analysis(text, analysis, cache_key)
+                results[indexes[0]] = analysis
+                # Identical chunks get their own copy so callers can modify results
+                for i in indexes[1:]:
+                    results[i] = copy.deepcopy(analysis)
+        finally:
+            response.close()
+    except Exception as e:
+        logger.error(f"Error analyzing chunks with the message batch API: {str(e)}")
+        logger.error(traceback.format_exc())
+        for _, indexes in to_send.values():
+            for i in indexes:
+                results[i] = {"error": str(e), "chunk_index": i, "partial_analysis": {}}
+        to_send.clear()
+    
+    # Requests missing from the results file
+    for _, indexes in to_send.values():
+        for i in indexes:
+            results[i] = {"error": "No result in message batch", "chunk_index": i, "partial_analysis": {}}
+    
+    logger.info(f"Finished analysis of {len(results)} chunks")
+    return results
 
 def analyze_single_thread(thread_content: str, api_key: str) -> Dict[str, Any]:
     """
@@ -550,53 +1332,14 @@ def analyze_single_thread(thread_content: str, api_key: str) -> Dict[str, Any]:
         logger.info("Thread analysis completed successfully")
         
         # Ensure the analysis has all necessary fields
-        required_fields = [
-            'categories', 'top_discussions', 'response_quality', 
-            'improvement_areas', 'user_satisfaction', 'unmet_needs',
-            'product_effectiveness', 'key_insights', 'negative_chats'
-        ]
-        
-        for field in required_fields:
-            if field not in analysis:
-                analysis[field] = {}
-        
-        # Normalize key_insights structure to prevent KeyError: 'key'
-        if 'key_insights' in analysis:
-            normalized_insights = []
-            for insight in analysis['key_insights']:
-                if isinstance(insight, str):
-                    normalized_insights.append({"insight": insight})
-                elif isinstance(insight, dict):
-                    # Handle case where insight is under "key" or missing completely
-                    if 'insight' not in insight:
-                        if 'key' in insight:
-                            insight['insight'] = insight['key']
-                        elif len(insight) > 0:
-                            # Just use the first item as the insight
-                            first_key = list(insight.keys())[0]
-                            insight['insight'] = f"{first_key}: {insight[first_key]}"
-                        else:
-                            insight['insight'] = "Unknown insight"
-                    normalized_insights.append(insight)
-            analysis['key_insights'] = normalized_insights
-            
-        # Same for improvement areas
-        if 'improvement_areas' in analysis:
-            normalized_areas = []
-            for area in analysis['improvement_areas']:
-                if isinstance(area, str):
-                    normalized_areas.append({"area": area})
-                elif isinstance(area, dict):
-                    if 'area' not in area:
-                        if 'key' in area:
-                            area['area'] = area['key']
-                        elif len(area) > 0:
-                            first_key = list(area.keys())[0]
-                            area['area'] = f"{first_key}: {area[first_key]}"
-                        else:
-                            area['area'] = "Unknown area"
-                    normalized_areas.append(area)
-            analysis['improvement_areas'] = normalized_areas
+        if not REQUIRED_FIELD_SET.issubset(analysis):
+            for field in REQUIRED_FIELDS:
+                if field not in analysis:
+                    analysis[field] = {}
+        
+        # Normalize key_insights and improvement_areas to prevent KeyError: 'key'
+        analysis['key_insights'] = _normalize_keyed_list(analysis['key_insights'], 'insight')
+        analysis['improvement_areas'] = _normalize_keyed_list(analysis['improvement_areas'], 'area')
         
         return analysis
         
@@ -632,211 +1375,244 @@ def analyze_single_thread(thread_content: str, api_key: str) -> Dict[str, Any]:
             }
         }
 
-def combine_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+def _dedupe_key(item: Any) -> Any:
     """
-    Combine analysis results from multiple chunks into a single comprehensive analysis
+    Hashable stand-in for a JSON value that compares equal exactly when the
+    values do, so lists of dicts can be de-duplicated with a set
+    """
+    if isinstance(item, dict):
+        return frozenset((key, _dedupe_key(value)) for key, value in item.items())
+    if isinstance(item, list):
+        return tuple(_dedupe_key(value) for value in item)
+    return item
+
+def _extend_unique(target: List[Any], items: Iterable[Any], seen: set, limit: Optional[int] = None) -> None:
+    """
+    Append items not seen before to target; seen holds the keys already in target
     
-    Args:
-        results: List of analysis results from individual chunks
-        
-    Returns:
-        Combined analysis
+    With a limit, only the first limit unique items are kept and the rest
+    are skipped without being hashed.
+    """
+    for item in items:
+        if limit is not None and len(target) >= limit:
+            return
+        key = _dedupe_key(item)
+        if key not in seen:
+            seen.add(key)
+            target.append(item)
+
+# Fields the combined analysis truncates; only their first unique items are kept
+MAX_TOP_DISCUSSIONS = 5
+MAX_QUALITY_EXAMPLES = 3
+MAX_KEY_INSIGHTS = 5
+
+class ResultCombiner:
     """
-    if not results:
-        return {"error": "No analysis results to combine"}
+    Online reducer that merges chunk analyses into a single comprehensive analysis
     
-    # If there's only one result and it's a mock, just return it
-    if len(results) == 1:
-        # Check if we're likely dealing with mock data
-        if "categories" in results[0] and len(results[0]["categories"]) >= 5:
-            logger.info("Only one result, likely mock data, returning as is")
-            return results[0]
+    Results are folded in one at a time, so callers can merge each analysis as
+    soon as it arrives instead of keeping every per-chunk result around.
     
-    # Initialize combined analysis structure
-    combined = {
-        "categories": [],
-        "top_discussions": [],
-        "response_quality": {
-            "average_score": 0,
-            "good_examples": [],
-            "poor_examples": []
-        },
-        "improvement_areas": [],
-        "user_satisfaction": {
-            "overall_assessment": "",
-            "positive_indicators": [],
-            "negative_indicators": []
-        },
-        "unmet_needs": [],
-        "product_effectiveness": {
-            "assessment": "",
-            "strengths": [],
-            "weaknesses": []
-        },
-        "key_insights": [],
-        "negative_chats": {
-            "categories": []
-        }
-    }
+    Usage:
+        combiner = ResultCombiner()
+        for result in results:
+            combiner.fold(result)
+        combined = combiner.finalize()
+    """
     
-    # Counter for averaging scores
-    quality_scores = []
-    chunk_count = 0
+    __slots__ = ("combined", "quality_scores", "chunk_count", "result_count", "first_result",
+                 "seen", "topics_by_name", "assessment_parts", "pipeline")
     
-    # Process each chunk's analysis
-    for result in results:
+    def __init__(self):
+        # Initialize combined analysis structure
+        self.combined = {
+            "categories": [],
+            "top_discussions": [],
+            "response_quality": {
+                "average_score": 0,
+                "good_examples": [],
+                "poor_examples": []
+            },
+            "improvement_areas": [],
+            "user_satisfaction": {
+                "overall_assessment": "",
+                "positive_indicators": [],
+                "negative_indicators": []
+            },
+            "unmet_needs": [],
+            "product_effectiveness": {
+                "assessment": "",
+                "strengths": [],
+                "weaknesses": []
+            },
+            "key_insights": [],
+            "negative_chats": {
+                "categories": []
+            }
+        }
+        
+        # Counter for averaging scores
+        self.quality_scores = []
+        self.chunk_count = 0
+        self.result_count = 0
+        self.first_result = None
+        
+        # Dedupe keys already in each combined list, and discussion topics by name,
+        # so merging stays linear in the number of items
+        self.seen = defaultdict(set)
+        self.topics_by_name = {}
+        
+        # Assessment texts per (field, text field), joined once in finalize
+        # rather than re-concatenating the growing string for every result
+        self.assessment_parts = defaultdict(list)
+        
+        # (result field, merge) pairs applied to every folded result
+        self.pipeline = (
+            ("categories", functools.partial(self._merge_list, "categories")),
+            ("top_discussions", self._merge_topics),
+            ("response_quality", self._merge_quality),
+            ("improvement_areas", functools.partial(self._merge_list, "improvement_areas")),
+            ("user_satisfaction", functools.partial(
+                self._merge_assessment, "user_satisfaction", "overall_assessment",
+                ("positive_indicators", "negative_indicators"))),
+            ("unmet_needs", functools.partial(self._merge_list, "unmet_needs")),
+            ("product_effectiveness", functools.partial(
+                self._merge_assessment, "product_effectiveness", "assessment",
+                ("strengths", "weaknesses"))),
+            ("key_insights", functools.partial(self._merge_list, "key_insights", limit=MAX_KEY_INSIGHTS)),
+            ("negative_chats", self._merge_negative_chats)
+        )
+    
+    def fold(self, result: Dict[str, Any]) -> None:
+        """Merge one chunk's analysis into the combined analysis"""
+        self.result_count += 1
+        if self.first_result is None:
+            self.first_result = result
+        
         if "error" in result:
             logger.warning(f"Skipping result with error: {result.get('error')}")
-            continue
+            return
         
-        chunk_count += 1
-        
-        # Aggregate categories
-        if "categories" in result:
-            combined["categories"].extend([cat for cat in result["categories"] 
-                                          if cat not in combined["categories"]])
-        
-        # Aggregate top discussions
-        if "top_discussions" in result:
-            # Add unique discussion topics
-            for topic in result["top_discussions"]:
-                if isinstance(topic, dict) and "topic" in topic:
-                    # Handle case where topics are objects with counts
-                    existing = next((t for t in combined["top_discussions"] 
-                                     if isinstance(t, dict) and t.get("topic") == topic["topic"]), None)
-                    if existing:
-                        existing["count"] = existing.get("count", 0) + topic.get("count", 1)
-                    else:
-                        combined["top_discussions"].append(topic)
-                elif topic not in combined["top_discussions"]:
-                    # Handle case where topics are simple strings
-                    combined["top_discussions"].append(topic)
-        
-        # Aggregate response quality
-        if "response_quality" in result:
-            if isinstance(result["response_quality"], dict):
-                if "score" in result["response_quality"]:
-                    quality_scores.append(result["response_quality"]["score"])
-                elif "average_score" in result["response_quality"]:
-                    quality_scores.append(result["response_quality"]["average_score"])
-                
-                # Add unique examples
-                if "good_examples" in result["response_quality"]:
-                    combined["response_quality"]["good_examples"].extend(
-                        [ex for ex in result["response_quality"]["good_examples"] 
-                         if ex not in combined["response_quality"]["good_examples"]]
-                    )
-                if "poor_examples" in result["response_quality"]:
-                    combined["response_quality"]["poor_examples"].extend(
-                        [ex for ex in result["response_quality"]["poor_examples"] 
-                         if ex not in combined["response_quality"]["poor_examples"]]
-                    )
-            elif isinstance(result["response_quality"], (int, float)):
-                quality_scores.append(result["response_quality"])
-        
-        # Aggregate improvement areas
-        if "improvement_areas" in result:
-            combined["improvement_areas"].extend(
-                [area for area in result["improvement_areas"] 
-                 if area not in combined["improvement_areas"]]
-            )
+        self.chunk_count += 1
         
-        # Aggregate user satisfaction
-        if "user_satisfaction" in result:
-            if isinstance(result["user_satisfaction"], dict):
-                # Add assessment text
-                if "overall_assessment" in result["user_satisfaction"] and result["user_satisfaction"]["overall_assessment"]:
-                    if combined["user_satisfaction"]["overall_assessment"]:
-                        combined["user_satisfaction"]["overall_assessment"] += " " + result["user_satisfaction"]["overall_assessment"]
-                    else:
-                        combined["user_satisfaction"]["overall_assessment"] = result["user_satisfaction"]["overall_assessment"]
-                
-                # Add indicators
-                if "positive_indicators" in result["user_satisfaction"]:
-                    combined["user_satisfaction"]["positive_indicators"].extend(
-                        [ind for ind in result["user_satisfaction"]["positive_indicators"] 
-                         if ind not in combined["user_satisfaction"]["positive_indicators"]]
-                    )
-                if "negative_indicators" in result["user_satisfaction"]:
-                    combined["user_satisfaction"]["negative_indicators"].extend(
-                        [ind for ind in result["user_satisfaction"]["negative_indicators"] 
-                         if ind not in combined["user_satisfaction"]["negative_indicators"]]
-                    )
-            elif isinstance(result["user_satisfaction"], str):
-                if combined["user_satisfaction"]["overall_assessment"]:
-                    combined["user_satisfaction"]["overall_assessment"] += " " + result["user_satisfaction"]
+        # One lookup per field; each merge handles the shapes its field can take
+        for field, merge in self.pipeline:
+            value = result.get(field)
+            if value is not None:
+                merge(value)
+    
+    def _merge_list(self, field: str, items: Iterable[Any], limit: Optional[int] = None) -> None:
+        """Aggregate a list field, keeping only items not seen before"""
+        _extend_unique(self.combined[field], items, self.seen[field], limit)
+    
+    def _merge_topics(self, topics: Iterable[Any]) -> None:
+        """Aggregate top discussions, summing the counts of topics seen before"""
+        top_discussions = self.combined["top_discussions"]
+        topics_by_name = self.topics_by_name
+        for topic in topics:
+            if isinstance(topic, dict) and "topic" in topic:
+                # Handle case where topics are objects with counts
+                topic_key = _dedupe_key(topic["topic"])
+                existing = topics_by_name.get(topic_key)
+                if existing:
+                    existing["count"] = existing.get("count", 0) + topic.get("count", 1)
                 else:
-                    combined["user_satisfaction"]["overall_assessment"] = result["user_satisfaction"]
+                    topics_by_name[topic_key] = topic
+                    top_discussions.append(topic)
+            else:
+                # Handle case where topics are simple strings
+                _extend_unique(top_discussions, (topic,), self.seen["top_discussions"])
+    
+    def _merge_quality(self, quality: Any) -> None:
+        """Aggregate response quality scores and examples"""
+        if isinstance(quality, dict):
+            if "score" in quality:
+                self.quality_scores.append(quality["score"])
+            elif "average_score" in quality:
+                self.quality_scores.append(quality["average_score"])
+            
+            # Add unique examples
+            combined_quality = self.combined["response_quality"]
+            for examples_field in ("good_examples", "poor_examples"):
+                examples = quality.get(examples_field)
+                if examples is not None:
+                    _extend_unique(combined_quality[examples_field], examples,
+                                   self.seen[examples_field], MAX_QUALITY_EXAMPLES)
+        elif isinstance(quality, (int, float)):
+            self.quality_scores.append(quality)
+    
+    def _merge_assessment(self, field: str, text_field: str, list_fields: Tuple[str, ...], value: Any) -> None:
+        """Aggregate an object with an assessment text and lists (or a bare assessment string)"""
+        target = self.combined[field]
+        if isinstance(value, dict):
+            text = value.get(text_field)
+            for list_field in list_fields:
+                items = value.get(list_field)
+                if items is not None:
+                    _extend_unique(target[list_field], items, self.seen[list_field])
+        elif isinstance(value, str):
+            text = value
+        else:
+            return
         
-        # Aggregate unmet needs
-        if "unmet_needs" in result:
-            combined["unmet_needs"].extend(
-                [need for need in result["unmet_needs"] 
-                 if need not in combined["unmet_needs"]]
-            )
+        # Collect the assessment text
+        if text:
+            self.assessment_parts[(field, text_field)].append(text)
+    
+    def _merge_negative_chats(self, negative_chats: Any) -> None:
+        """Aggregate negative chat categories"""
+        if isinstance(negative_chats, dict) and "categories" in negative_chats:
+            _extend_unique(self.combined["negative_chats"]["categories"],
+                           negative_chats["categories"], self.seen["negative_chat_categories"])
+    
+    def finalize(self) -> Dict[str, Any]:
+        """Return the combined analysis once every result has been folded in"""
+        if not self.result_count:
+            return {"error": "No analysis results to combine"}
         
-        # Aggregate product effectiveness
-        if "product_effectiveness" in result:
-            if isinstance(result["product_effectiveness"], dict):
-                # Add assessment text
-                if "assessment" in result["product_effectiveness"] and result["product_effectiveness"]["assessment"]:
-                    if combined["product_effectiveness"]["assessment"]:
-                        combined["product_effectiveness"]["assessment"] += " " + result["product_effectiveness"]["assessment"]
-                    else:
-                        combined["product_effectiveness"]["assessment"] = result["product_effectiveness"]["assessment"]
-                
-                # Add strengths and weaknesses
-                if "strengths" in result["product_effectiveness"]:
-                    combined["product_effectiveness"]["strengths"].extend(
-                        [s for s in result["product_effectiveness"]["strengths"] 
-                         if s not in combined["product_effectiveness"]["strengths"]]
-                    )
-                if "weaknesses" in result["product_effectiveness"]:
-                    combined["product_effectiveness"]["weaknesses"].extend(
-                        [w for w in result["product_effectiveness"]["weaknesses"] 
-                         if w not in combined["product_effectiveness"]["weaknesses"]]
-                    )
-            elif isinstance(result["product_effectiveness"], str):
-                if combined["product_effectiveness"]["assessment"]:
-                    combined["product_effectiveness"]["assessment"] += " " + result["product_effectiveness"]
-                else:
-                    combined["product_effectiveness"]["assessment"] = result["product_effectiveness"]
+        # If there's only one result and it's a mock, just return it
+        if self.result_count == 1:
+            # Check if we're likely dealing with mock data
+            if "categories" in self.first_result and len(self.first_result["categories"]) >= 5:
+                logger.info("Only one result, likely mock data, returning as is")
+                return self.first_result
+        
+        combined = self.combined
+        quality_scores = self.quality_scores
         
-        # Aggregate key insights
-        if "key_insights" in result:
-            combined["key_insights"].extend(
-                [insight for insight in result["key_insights"] 
-                 if insight not in combined["key_insights"]]
+        # Join the assessment texts of all results
+        for (field, text_field), parts in self.assessment_parts.items():
+            combined[field][text_field] = parts[0] if len(parts) == 1 else " ".join(parts)
+        
+        # Calculate average response quality score
+        if quality_scores:
+            combined["response_quality"]["average_score"] = sum(quality_scores) / len(quality_scores)
+        
+        # Keep the 5 top discussions, by count if they have count attributes.
+        # Counts keep changing while results are folded, so this is done once here
+        if all(isinstance(topic, dict) and "count" in topic for topic in combined["top_discussions"]):
+            combined["top_discussions"] = heapq.nlargest(
+                MAX_TOP_DISCUSSIONS,
+                combined["top_discussions"],
+                key=lambda x: x.get("count", 0)
             )
+        else:
+            del combined["top_discussions"][MAX_TOP_DISCUSSIONS:]
         
-        # Aggregate negative chats
-        if "negative_chats" in result:
-            if isinstance(result["negative_chats"], dict) and "categories" in result["negative_chats"]:
-                combined["negative_chats"]["categories"].extend(
-                    [cat for cat in result["negative_chats"]["categories"] 
-                     if cat not in combined["negative_chats"]["categories"]]
-                )
-    
-    # Calculate average response quality score
-    if quality_scores:
-        combined["response_quality"]["average_score"] = sum(quality_scores) / len(quality_scores)
-    
-    # Sort top discussions by count if they have count attributes
-    if all(isinstance(topic, dict) and "count" in topic for topic in combined["top_discussions"]):
-        combined["top_discussions"] = sorted(
-            combined["top_discussions"], 
-            key=lambda x: x.get("count", 0), 
-            reverse=True
-        )
-    
-    # Limit top discussions to 5
-    combined["top_discussions"] = combined["top_discussions"][:5]
-    
-    # Limit examples to avoid overwhelming results
-    combined["response_quality"]["good_examples"] = combined["response_quality"]["good_examples"][:3]
-    combined["response_quality"]["poor_examples"] = combined["response_quality"]["poor_examples"][:3]
-    
-    # Limit key insights to the top 5
-    combined["key_insights"] = combined["key_insights"][:5]
+        # Examples and key insights were capped while folding
+        return combined
+
+def combine_results(results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine analysis results from multiple chunks into a single comprehensive analysis
     
-    return combined
\ No newline at end of file
+    Args:
+        results: Analysis results from individual chunks
+        
+    Returns:
+        Combined analysis
+    """
+    combiner = ResultCombiner()
+    for result in results:
+        combiner.fold(result)
+    return combiner.finalize()
@@ -10,9 +10,14 @@ RESULTS_FOLDER = 'analysis_results'
 THREADS_FOLDER = 'organized_threads'
 DATA_FOLDER = 'data'
 MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max upload
-ALLOWED_EXTENSIONS = {'txt', 'rtf', 'json'}
+UPLOAD_BUFFER_SIZE = 1 << 20  # 1MB blocks when copying upload streams to disk
+UPLOAD_SPOOL_SIZE = 5 << 20  # Uploads up to 5MB are held in memory while being parsed
+ALLOWED_EXTENSIONS = frozenset({'txt', 'rtf', 'json'})
 MAX_CHUNKS = int(os.environ.get('MAX_CHUNKS', 1))
+ANALYSIS_MAX_WORKERS = int(os.environ.get('ANALYSIS_MAX_WORKERS', 8))  # Concurrent Claude requests
 SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_key_for_testing')
+REDIS_URL = os.environ.get('REDIS_URL')  # Optional shared session store for multi-host deployments
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 7 * 24 * 3600))  # Seconds a Redis-backed session is kept
 
 # CORS configuration
 CORS_ORIGINS = ["http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:8095"]
@@ -35,4 +40,4 @@ def create_app_directories():
 
 def allowed_file(filename):
     """Check if a file has an allowed extension"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return os.path.splitext(filename)[1][1:].lower() in ALLOWED_EXTENSIONS
@@ -0,0 +1,20 @@
+"""
+Gunicorn configuration for HitCraft Chat Analyzer
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8096)}"
+
+# Threaded workers: uploads, chunking and Claude calls overlap within a worker.
+# Analysis progress (analysis_state) lives in process memory, so status polling
+# only sees analyses run by the same worker; raise WEB_CONCURRENCY only behind
+# sticky sessions.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Analysis requests can wait on Claude for several minutes
+timeout = 600
+
+# Create the app once in the master so workers share it (and its secret key)
+preload_app = True
@@ -2,13 +2,20 @@
 Logging functionality for HitCraft Chat Analyzer
 """
 import logging
+import queue
+import threading
 import time
+from collections import deque
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Global buffer for logging messages to display on the frontend
-log_buffer = []
+# Global buffer for logging messages to display on the frontend.
+# Writers only put entries on log_queue (no Python-level lock); readers drain
+# it into the bounded log_buffer, so old messages fall off automatically.
+log_queue = queue.SimpleQueue()
+log_buffer = deque(maxlen=1000)
+log_buffer_lock = threading.Lock()
 
 # Our application logger
 logger = logging.getLogger('hitcraft_analyzer')
@@ -16,32 +23,24 @@ logger = logging.getLogger('hitcraft_analyzer')
 # Analysis state - will be initialized by the app
 analysis_state = None
 
-# Context manager to temporarily disable logging for imported functions
-class FunctionLoggingDisabled:
-    """Context manager to temporarily disable logging for imported functions"""
-    def __enter__(self):
-        # Save the current state
-        self.logger_level = logger.level
-        # Temporarily disable the logger
-        logger.setLevel(logging.CRITICAL)
-        return self
-        
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        # Restore the logger to its original state
-        logger.setLevel(self.logger_level)
-
 def add_log(message, level="info"):
     """Add a log message to the buffer for frontend display"""
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
     log_entry = {"timestamp": timestamp, "message": message, "level": level}
-    log_buffer.append(log_entry)
+    log_queue.put(log_entry)
+    
+    # Fold the queue into the bounded buffer if nobody has polled the logs for a
+    # while; skip it if another thread is already draining
+    if log_queue.qsize() > log_buffer.maxlen and log_buffer_lock.acquire(blocking=False):
+        try:
+            _drain_log_queue()
+        finally:
+            log_buffer_lock.release()
     
     # Also add to analysis state log entries for thread analysis progress
     if analysis_state:
+        # log_entries is a bounded deque, so old entries fall off on their own
         analysis_state['log_entries'].append(message)
-        # Keep only last 100 entries
-        if len(analysis_state['log_entries']) > 100:
-            analysis_state['log_entries'].pop(0)
     
     # Log to the standard logger
     if level == "error":
@@ -50,14 +49,20 @@ def add_log(message, level="info"):
         logger.warning(message)
     else:
         logger.info(message)
-    
-    # Keep only the last 1000 messages to prevent memory issues
-    if len(log_buffer) > 1000:
-        log_buffer.pop(0)
+
+def _drain_log_queue():
+    """Move queued log entries into log_buffer; caller must hold log_buffer_lock"""
+    while True:
+        try:
+            log_buffer.append(log_queue.get_nowait())
+        except queue.Empty:
+            break
 
 def get_logs():
-    """Return the log buffer"""
-    return log_buffer
+    """Return a snapshot of the log buffer, including messages queued since the last call"""
+    with log_buffer_lock:
+        _drain_log_queue()
+        return list(log_buffer)
 
 def set_analysis_state(state):
     """Set the analysis state reference"""
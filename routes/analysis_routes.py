@@ -3,18 +3,19 @@ Analysis routes for HitCraft Chat Analyzer
 """
 from flask import Blueprint, request, jsonify, session
 import os
-import json
+import orjson
 import time
 import datetime
 import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import islice
 import logging
-import anthropic
 import requests
-from flask import Blueprint, request, jsonify, session
 from logging_manager import add_log
 import config
-import thread_analyzer
+import session_store
 import thread_storage
 import copy
 import glob
@@ -22,6 +23,9 @@ import glob
 # Create a Blueprint
 analysis_bp = Blueprint('analysis', __name__)
 
+# Number of progress log entries kept in the analysis state
+ANALYSIS_LOG_LIMIT = 100
+
 # Analysis state tracking
 analysis_state = {
     'is_analyzing': False,
@@ -36,7 +40,7 @@ analysis_state = {
     'thread_results': [],
     'combined_results': None,
     'thread_limit': 0,
-    'log_entries': [],  # Initialize log entries array
+    'log_entries': deque(maxlen=ANALYSIS_LOG_LIMIT),  # Bounded log, oldest entries fall off
     'evidence_map': {}  # Map insights to their thread evidence
 }
 
@@ -56,14 +60,50 @@ def add_analysis_log(message, level="info"):
     
     # Make sure log_entries exists
     if 'log_entries' not in analysis_state:
-        analysis_state['log_entries'] = []
+        analysis_state['log_entries'] = deque(maxlen=ANALYSIS_LOG_LIMIT)
         
-    # Add the entry
+    # Add the entry; the deque drops the oldest one past the limit
     analysis_state['log_entries'].append(entry)
+
+def recent_log_entries(count):
+    """
+    Return the last count analysis log entries as a list
+    
+    Args:
+        count: Maximum number of entries to return
+    """
+    entries = analysis_state.get('log_entries', ())
+    return list(islice(entries, max(len(entries) - count, 0), None))
+
+def serializable_analysis_state():
+    """
+    Return a copy of analysis_state that jsonify can encode
     
-    # Keep only the last 100 entries
-    if len(analysis_state['log_entries']) > 100:
-        analysis_state['log_entries'] = analysis_state['log_entries'][-100:]
+    The bounded log deque becomes a plain list and the worker thread object is
+    left out.
+    """
+    state = {key: value for key, value in analysis_state.items() if key != 'analysis_thread'}
+    state['log_entries'] = list(analysis_state.get('log_entries', ()))
+    return state
+
+def count_available_threads(session_id):
+    """
+    Return the number of threads extracted for a session
+    
+    Uses the count recorded at upload time and only falls back to scanning
+    the threads directory for sessions created before it was recorded.
+    """
+    if not session_store.is_valid_session_id(session_id):
+        return 0
+    available_threads = session_store.get_session_value(session_id, 'threads_available')
+    if available_threads is not None:
+        return available_threads
+    
+    threads_dir = os.path.join(config.TEMP_FOLDER, session_id, 'threads')
+    try:
+        return sum(1 for entry in os.scandir(threads_dir) if entry.name.endswith('.txt'))
+    except FileNotFoundError:
+        return 0
 
 @analysis_bp.route('/analyze_threads', methods=['POST'])
 def analyze_threads():
@@ -75,7 +115,7 @@ def analyze_threads():
         
         # Get session information
         session_id = session.get('session_id')
-        filename = session.get('filename')
+        filename = session_store.get_session_value(session_id, 'filename')
         
         # Check if session_id is passed in the JSON body
         data = request.get_json(silent=True)
@@ -146,7 +186,7 @@ def analyze_threads():
         analysis_state['thread_results'] = []
         analysis_state['combined_results'] = None
         analysis_state['thread_limit'] = len(thread_data)
-        analysis_state['log_entries'] = []  # Reset log entries
+        analysis_state['log_entries'].clear()  # Reset log entries
         analysis_state['evidence_map'] = {}  # Reset evidence map
         
         add_analysis_log(f"Starting analysis of {len(thread_data)} threads", "info")
@@ -186,31 +226,25 @@ def thread_count():
     try:
         # Get session information
         session_id = session.get('session_id')
-        filename = session.get('filename')
+        filename = session_store.get_session_value(session_id, 'filename')
         
         if not session_id or not filename:
             return jsonify({'error': 'No active session or filename'}), 404
             
         # Set up paths
         session_dir = os.path.join(config.TEMP_FOLDER, session_id)
-        threads_dir = os.path.join(session_dir, 'threads')
         results_dir = os.path.join(session_dir, 'results')
         
         # Count thread files
-        available_threads = 0
-        try:
-            thread_files = [f for f in os.listdir(threads_dir) if f.endswith('.txt')]
-            available_threads = len(thread_files)
-        except FileNotFoundError:
-            pass
+        available_threads = count_available_threads(session_id)
             
         # Count analyzed threads from session results
         analyzed_threads = 0
         combined_results_path = os.path.join(results_dir, 'combined_results.json')
         if os.path.isfile(combined_results_path):
             try:
-                with open(combined_results_path, 'r') as f:
-                    results = json.load(f)
+                with open(combined_results_path, 'rb') as f:
+                    results = orjson.loads(f.read())
                 analyzed_threads = len(results.get('thread_results', []))
             except:
                 pass
@@ -260,7 +294,7 @@ def check_progress():
             'progress': round(progress, 1),
             'elapsed_seconds': elapsed,
             'remaining_seconds': remaining,
-            'log_entries': analysis_state['log_entries'][-20:],  # Send last 20 log entries
+            'log_entries': recent_log_entries(20),  # Send last 20 log entries
             'has_results': analysis_state['combined_results'] is not None
         })
         
@@ -296,23 +330,16 @@ def get_analysis_status():
             session_id = request.args.get('session_id')
             
         # If we have a session ID, check for available threads
-        if session_id:
-            # Set up session directory paths
-            session_dir = os.path.join(config.TEMP_FOLDER, session_id)
-            threads_dir = os.path.join(session_dir, 'threads')
+        if session_id and analysis_state.get('threads_available', 0) == 0:
+            thread_count = count_available_threads(session_id)
             
-            # Count available threads
-            if os.path.exists(threads_dir):
-                thread_files = glob.glob(os.path.join(threads_dir, '*.txt'))
-                thread_count = len(thread_files)
-                
-                # Update analysis state with thread count if we found threads
-                if thread_count > 0 and analysis_state.get('threads_available', 0) == 0:
-                    analysis_state['threads_available'] = thread_count
-                    add_analysis_log(f"Updated analysis state with {thread_count} available threads", "info")
+            # Update analysis state with thread count if we found threads
+            if thread_count > 0:
+                analysis_state['threads_available'] = thread_count
+                add_analysis_log(f"Updated analysis state with {thread_count} available threads", "info")
         
         # Return the current state
-        return jsonify(analysis_state)
+        return jsonify(serializable_analysis_state())
     except Exception as e:
         error_message = str(e)
         add_analysis_log(f"Error getting analysis status: {error_message}", "error")
@@ -332,7 +359,7 @@ def debug_analysis_state():
         
         result = {
             'session_id': session_id,
-            'analysis_state': analysis_state,
+            'analysis_state': serializable_analysis_state(),
             'session_dir_exists': os.path.exists(session_dir) if session_dir else False,
             'threads_dir_exists': os.path.exists(threads_dir) if threads_dir else False
         }
@@ -346,8 +373,8 @@ def debug_analysis_state():
             thread_list_path = os.path.join(threads_dir, 'thread_list.json')
             if os.path.exists(thread_list_path):
                 try:
-                    with open(thread_list_path, 'r') as f:
-                        thread_list = json.load(f)
+                    with open(thread_list_path, 'rb') as f:
+                        thread_list = orjson.loads(f.read())
                         result['thread_list_count'] = len(thread_list)
                 except Exception as e:
                     result['thread_list_error'] = str(e)
@@ -392,7 +419,7 @@ def analysis_progress():
             'threads_total': total_threads,
             'progress': (analyzed_threads / total_threads * 100) if total_threads > 0 else 0,
             'has_results': has_results,
-            'log_entries': analysis_state.get('log_entries', [])[-10:]  # Last 10 log entries
+            'log_entries': recent_log_entries(10)  # Last 10 log entries
         }
         
         add_analysis_log(f"Progress check: {response['status']}, {response['threads_analyzed']}/{response['threads_total']}")
@@ -476,9 +503,100 @@ def get_insight_evidence():
             'error': str(e)
         }), 500
 
+def _analyze_thread_entry(api_key, thread, index, num_threads, state, state_lock):
+    """
+    Analyze one thread of a background batch
+    
+    Returns:
+        tuple: (thread_id, analyzed, thread_result) where thread_result is None
+        if the analysis produced nothing usable
+    """
+    thread_id = thread['id']
+    add_analysis_log(f"Analyzing thread {thread_id} ({index+1}/{num_threads})")
+    
+    # Store metadata in state
+    with state_lock:
+        state['current_thread'] = thread_id
+        state['last_updated'] = datetime.datetime.now()
+    
+    try:
+        # Extract messages from thread
+        messages = []
+        
+        # Try to get messages from thread content directly
+        if 'content' in thread and 'messages' in thread['content']:
+            messages = thread['content']['messages']
+        else:
+            # Try to load from JSON file if not in thread data
+            thread_dir = os.path.join(thread_storage.STORAGE_DIR, thread_id)
+            thread_json = os.path.join(thread_dir, f"{thread_id}.json")
+            
+            if os.path.exists(thread_json):
+                with open(thread_json, 'rb') as f:
+                    thread_content = orjson.loads(f.read())
+                    messages = thread_content.get('messages', [])
+            else:
+                add_analysis_log(f"Error: No messages found for thread {thread_id}", "error")
+                return thread_id, False, None
+        
+        # Call Claude to analyze this thread
+        result = analyze_single_thread(api_key, messages)
+        
+        # Debug log the result structure
+        if result:
+            add_analysis_log(f"Result for thread {thread_id} has keys: {list(result.keys())}", "debug")
+            if 'key_insights' in result:
+                if isinstance(result['key_insights'], list):
+                    # Check the structure of the first few key_insights to help debugging
+                    for idx, insight in enumerate(result['key_insights'][:3]):
+                        add_analysis_log(f"key_insights[{idx}] type: {type(insight)}, structure: {insight}", "debug")
+                else:
+                    add_analysis_log(f"key_insights is not a list: {type(result['key_insights'])}", "debug")
+        
+        if result and 'error' not in result:
+            try:
+                # Add thread ID to result
+                result['thread_id'] = thread_id
+                
+                # Deep copy the result before modifying to prevent unexpected side effects
+                thread_result = copy.deepcopy(result)
+                
+                # No need to process evidence map if we're encountering errors
+                # Just track the thread as analyzed
+                with state_lock:
+                    state['analyzed_threads'] += 1
+                add_analysis_log(f"Completed analysis of thread {thread_id} ({index+1}/{num_threads})", "info")
+                return thread_id, True, thread_result
+            except KeyError as ke:
+                add_analysis_log(f"KeyError processing thread {thread_id}: {str(ke)}", "error")
+                add_analysis_log(f"Keys available in result: {list(result.keys())}", "debug")
+                # Try to continue despite the error, just add what we have
+                with state_lock:
+                    state['analyzed_threads'] += 1
+                return thread_id, True, None
+            except Exception as thread_error:
+                add_analysis_log(f"Error processing thread {thread_id}: {str(thread_error)}", "error")
+                add_analysis_log(traceback.format_exc(), "error")
+        else:
+            add_analysis_log(f"Error analyzing thread {thread_id}: {result.get('error', 'Unknown error') if result else 'Unknown error'}", "error")
+    
+    except Exception as thread_error:
+        add_analysis_log(f"Error processing thread {thread_id}: {str(thread_error)}", "error")
+        add_analysis_log(traceback.format_exc(), "error")
+    finally:
+        with state_lock:
+            state['completed_threads'] = state.get('completed_threads', 0) + 1
+    
+    return thread_id, False, None
+
 # Function to analyze threads in background
 def analyze_threads_in_background(api_key, thread_data, state):
-    """Analyze threads in the background and update state"""
+    """
+    Analyze threads in the background and update state
+    
+    Claude calls are network-bound, so threads are dispatched to a worker pool
+    of up to config.ANALYSIS_MAX_WORKERS. Results keep the input order.
+    """
     try:
         num_threads = len(thread_data)
         add_analysis_log(f"Starting analysis batch for {num_threads} threads")
@@ -488,81 +606,22 @@ def analyze_threads_in_background(api_key, thread_data, state):
         evidence_map = {}
         analyzed_thread_ids = []
         
-        # For each thread
-        for i, thread in enumerate(thread_data):
-            thread_id = thread['id']
-            add_analysis_log(f"Analyzing thread {thread_id} ({i+1}/{num_threads})")
-            
-            # Store metadata in state
-            state['current_thread'] = thread_id
-            state['completed_threads'] = i
-            state['total_threads'] = num_threads
-            state['last_updated'] = datetime.datetime.now()
-            
-            try:
-                # Extract messages from thread
-                messages = []
-                
-                # Try to get messages from thread content directly
-                if 'content' in thread and 'messages' in thread['content']:
-                    messages = thread['content']['messages']
-                else:
-                    # Try to load from JSON file if not in thread data
-                    thread_dir = os.path.join(thread_storage.STORAGE_DIR, thread_id)
-                    thread_json = os.path.join(thread_dir, f"{thread_id}.json")
-                    
-                    if os.path.exists(thread_json):
-                        with open(thread_json, 'r', encoding='utf-8') as f:
-                            thread_content = json.load(f)
-                            messages = thread_content.get('messages', [])
-                    else:
-                        add_analysis_log(f"Error: No messages found for thread {thread_id}", "error")
-                        continue
-                
-                # Call Claude to analyze this thread
-                result = analyze_single_thread(api_key, messages)
-                
-                # Debug log the result structure
-                if result:
-                    add_analysis_log(f"Result for thread {thread_id} has keys: {list(result.keys())}", "debug")
-                    if 'key_insights' in result:
-                        if isinstance(result['key_insights'], list):
-                            # Check the structure of the first few key_insights to help debugging
-                            for idx, insight in enumerate(result['key_insights'][:3]):
-                                add_analysis_log(f"key_insights[{idx}] type: {type(insight)}, structure: {insight}", "debug")
-                        else:
-                            add_analysis_log(f"key_insights is not a list: {type(result['key_insights'])}", "debug")
-                
-                if result and 'error' not in result:
-                    try:
-                        # Add thread ID to result
-                        result['thread_id'] = thread_id
-                        
-                        # Deep copy the result before modifying to prevent unexpected side effects
-                        thread_result = copy.deepcopy(result)
-                        thread_results.append(thread_result)
-                        
-                        # No need to process evidence map if we're encountering errors
-                        # Just track the thread as analyzed
-                        analyzed_thread_ids.append(thread_id)
-                        state['analyzed_threads'] += 1
-                        add_analysis_log(f"Completed analysis of thread {thread_id} ({i+1}/{num_threads})", "info")
-                    except KeyError as ke:
-                        add_analysis_log(f"KeyError processing thread {thread_id}: {str(ke)}", "error")
-                        add_analysis_log(f"Keys available in result: {list(result.keys())}", "debug")
-                        # Try to continue despite the error, just add what we have
-                        analyzed_thread_ids.append(thread_id)
-                        state['analyzed_threads'] += 1
-                    except Exception as thread_error:
-                        add_analysis_log(f"Error processing thread {thread_id}: {str(thread_error)}", "error")
-                        add_analysis_log(traceback.format_exc(), "error")
-                else:
-                    add_analysis_log(f"Error analyzing thread {thread_id}: {result.get('error', 'Unknown error')}", "error")
-            
-            except Exception as thread_error:
-                add_analysis_log(f"Error processing thread {thread_id}: {str(thread_error)}", "error")
-                add_analysis_log(traceback.format_exc(), "error")
-                continue
+        state['completed_threads'] = 0
+        state['total_threads'] = num_threads
+        state_lock = threading.Lock()
+        
+        max_workers = max(1, min(config.ANALYSIS_MAX_WORKERS, num_threads))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = list(executor.map(
+                lambda item: _analyze_thread_entry(api_key, item[1], item[0], num_threads, state, state_lock),
+                enumerate(thread_data)
+            ))
+        
+        for thread_id, analyzed, thread_result in outcomes:
+            if analyzed:
+                analyzed_thread_ids.append(thread_id)
+            if thread_result is not None:
+                thread_results.append(thread_result)
         
         # Mark threads as analyzed in persistent storage
         thread_storage.mark_threads_as_analyzed(analyzed_thread_ids, evidence_map)
@@ -615,7 +674,9 @@ def analyze_single_thread(api_key, messages):
         thread_content = '\n'.join(messages)
             
         # Call Claude API directly since we have the thread content
-        result = thread_analyzer.claude_analyzer.analyze_single_thread(thread_content, api_key)
+        # (imported here so worker boot doesn't pay for the analyzer module)
+        import claude_analyzer
+        result = claude_analyzer.analyze_single_thread(thread_content, api_key)
         
         if result:
             # Normalize the result structure to prevent KeyErrors downstream
@@ -721,8 +782,8 @@ def save_thread_analysis(session_id, thread_id, result):
         
         # Save analysis result as JSON
         analysis_path = os.path.join(analysis_dir, f"{thread_id}.json")
-        with open(analysis_path, 'w') as f:
-            json.dump(result, f, indent=2)
+        with open(analysis_path, 'wb') as f:
+            f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
             
         return True
     except Exception as e:
@@ -779,8 +840,8 @@ def summarize_and_save_analysis_results(api_key, session_id, filename, threads):
     if os.path.exists(combined_path):
         # Load existing analysis
         try:
-            with open(combined_path, 'r', encoding='utf-8') as f:
-                existing_combined_results = json.load(f)
+            with open(combined_path, 'rb') as f:
+                existing_combined_results = orjson.loads(f.read())
                 add_analysis_log("Loaded existing analysis results to merge with", "info")
         except Exception as e:
             add_analysis_log(f"Error loading existing analysis: {str(e)}", "error")
@@ -1092,8 +1153,8 @@ def summarize_and_save_analysis_results(api_key, session_id, filename, threads):
     
     # Save combined results
     try:
-        with open(combined_path, 'w', encoding='utf-8') as f:
-            json.dump(combined_results, f, indent=2)
+        with open(combined_path, 'wb') as f:
+            f.write(orjson.dumps(combined_results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
         add_analysis_log(f"Saved combined analysis results to {combined_path}", "info")
     except Exception as e:
         add_analysis_log(f"Error saving combined results: {str(e)}", "error")
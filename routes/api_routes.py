@@ -3,9 +3,11 @@ API routes for HitCraft Chat Analyzer
 """
 import os
 import json
+import orjson
 import glob
+import zlib
 import datetime
-from flask import Blueprint, request, jsonify, session, send_from_directory, g, has_request_context
+from flask import Blueprint, Response, request, jsonify, session, send_file, send_from_directory, g, has_request_context
 import logging
 from logging_manager import add_log
 from thread_analyzer import filter_results_by_time
@@ -13,13 +15,16 @@ import config
 import thread_storage
 import threading
 import random
-import requests
 import traceback
 from dotenv import load_dotenv
 
 # Create Blueprint
 api_bp = Blueprint('api', __name__)
 
+def orjson_response(data, status=200):
+    """Serialize data with orjson into a JSON response"""
+    return Response(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS), status=status, mimetype='application/json')
+
 @api_bp.route('/claude-key', methods=['GET'])
 def get_claude_key():
     """Return the Claude API key"""
@@ -53,26 +58,34 @@ def dashboard_data():
         if not os.path.exists(results_dir):
             return jsonify({'error': 'No analysis results found'})
             
-        # Find all result files
-        result_files = glob.glob(os.path.join(results_dir, '*.json'))
+        # Find the newest result file by modification time
+        result_files = [entry for entry in os.scandir(results_dir) if entry.name.endswith('.json')]
         
         if not result_files:
             return jsonify({'error': 'No analysis results found'})
             
-        # Sort by modification time (newest first)
-        result_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-        newest_file = result_files[0]
-        
-        with open(newest_file, 'r') as f:
-            results = json.load(f)
+        newest_entry = max(result_files, key=lambda entry: entry.stat().st_mtime)
+        newest_file = newest_entry.path
         
         # Apply time filtering if necessary
         if start_date or end_date:
-            filtered_results = filter_results_by_time(results, start_date, end_date)
-            return jsonify(filtered_results)
-        
-        # Otherwise return all results
-        return jsonify(results)
+            # The filtered view only changes when the file or the filter does, so
+            # clients revalidating an unchanged view get a 304 without a reparse
+            st = newest_entry.stat()
+            etag = f"{st.st_mtime_ns:x}-{st.st_size:x}-{zlib.crc32(f'{start_date}|{end_date}'.encode('utf-8')):x}"
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                with open(newest_file, 'rb') as f:
+                    results = orjson.loads(f.read())
+                filtered_results = filter_results_by_time(results, start_date, end_date)
+                response = jsonify(filtered_results)
+            response.set_etag(etag, weak=True)
+            response.cache_control.no_cache = True
+            return response
+        
+        # Otherwise stream the file as-is; conditional lets clients revalidate with 304s
+        return send_file(os.path.abspath(newest_file), mimetype='application/json', conditional=True)
         
     except Exception as e:
         add_log(f"Error getting dashboard data: {str(e)}", "error")
@@ -101,7 +114,7 @@ def get_thread_listing():
 
         # Get all threads from persistent storage with pagination
         result = thread_storage.get_all_threads(page, per_page)
-        return jsonify(result)
+        return orjson_response(result)
         
     except Exception as e:
         add_log(f"Error listing threads: {str(e)}", "error")
@@ -131,7 +144,7 @@ def get_threads():
         # Get all threads from persistent storage with pagination
         result = thread_storage.get_all_threads(page, per_page)
         add_log(f"Returning {len(result['threads'])} threads (page {page}/{result['total_pages']})")
-        return jsonify(result)
+        return orjson_response(result)
         
     except Exception as e:
         add_log(f"Error getting threads: {str(e)}", "error")
@@ -189,7 +202,7 @@ def get_threads_new():
         # Get all threads from persistent storage with pagination
         result = thread_storage.get_all_threads(page, per_page)
         add_log(f"Returning {len(result.get('threads', []))} threads (page {page}/{result.get('total_pages', 1)})")
-        return jsonify(result)
+        return orjson_response(result)
         
     except Exception as e:
         add_log(f"Error getting threads: {str(e)}", "error")
@@ -233,7 +246,7 @@ def get_thread(thread_id):
 def get_results(filename):
     """Return a specific results file"""
     try:
-        return send_from_directory(config.RESULTS_FOLDER, filename)
+        return send_from_directory(os.path.abspath(config.RESULTS_FOLDER), filename, mimetype='application/json', conditional=True)
     except Exception as e:
         add_log(f"Error retrieving results file: {str(e)}", "error")
         return jsonify({'error': str(e)})
@@ -271,8 +284,8 @@ def debug_threads():
         
         if result['thread_list_exists']:
             try:
-                with open(thread_list_path, 'r') as f:
-                    thread_list = json.load(f)
+                with open(thread_list_path, 'rb') as f:
+                    thread_list = orjson.loads(f.read())
                     result['thread_count'] = len(thread_list)
             except Exception as e:
                 result['thread_list_error'] = str(e)
@@ -523,6 +536,8 @@ def analyze_thread_no_context(session_id, threads):
             'threads': [],
             'insights': []
         }
+        insights_by_key = {}  # insight key -> entry in analysis_results['insights']
+        evidence_by_key = {}  # insight key -> set of its evidence thread IDs
         
         # Process each thread
         for i, thread in enumerate(threads):
@@ -592,12 +607,13 @@ def analyze_thread_no_context(session_id, threads):
                 if 'insights' in thread_analysis and thread_analysis['insights']:
                     for insight in thread_analysis['insights']:
                         # Check if this insight already exists
-                        existing_insight = next((i for i in analysis_results['insights'] 
-                                               if i['key'] == insight['key']), None)
+                        existing_insight = insights_by_key.get(insight['key'])
                         
                         if existing_insight:
                             # Add this thread as evidence
-                            if thread_id not in existing_insight['evidence_threads']:
+                            evidence_threads = evidence_by_key[insight['key']]
+                            if thread_id not in evidence_threads:
+                                evidence_threads.add(thread_id)
                                 existing_insight['evidence_threads'].append(thread_id)
                                 existing_insight['evidence_count'] = len(existing_insight['evidence_threads'])
                         else:
@@ -611,6 +627,8 @@ def analyze_thread_no_context(session_id, threads):
                                 'category': insight.get('category', 'general')
                             }
                             analysis_results['insights'].append(new_insight)
+                            insights_by_key[insight['key']] = new_insight
+                            evidence_by_key[insight['key']] = {thread_id}
                 
                 logging.info(f"Completed analysis of thread {thread_id} ({i+1}/{len(threads)})")
                 
@@ -724,12 +742,8 @@ Format your entire response as a valid JSON object with the structure described
         # Make the API call to Claude
         logging.info(f"Calling Claude API for thread {thread_id}")
         
-        # Claude API headers - using the latest API version for Claude-3 models
-        headers = {
-            "x-api-key": api_key,
-            "Content-Type": "application/json",
-            "anthropic-version": "2023-06-01"
-        }
+        # Claude API headers - Content-Type and anthropic-version are set on the shared session
+        headers = {"x-api-key": api_key}
         
         # Claude API payload with model and parameters
         payload = {
@@ -738,50 +752,50 @@ Format your entire response as a valid JSON object with the structure described
             "messages": [
                 {"role": "user", "content": prompt}
             ],
-            "temperature": 0.2
+            "temperature": 0.2,
+            # Stream the response so the text is collected as it arrives
+            # instead of buffering the whole response body first
+            "stream": True
         }
         
-        # Make the API request
+        # Make the API request over the shared Claude connection pool
+        import claude_analyzer
         try:
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages",
+            response = claude_analyzer.claude_session.post(
+                claude_analyzer.CLAUDE_API_URL,
                 headers=headers,
-                json=payload,
+                data=orjson.dumps(payload),
+                stream=True,
                 timeout=60  # Add timeout to prevent hanging
             )
             
             if response.status_code != 200:
-                logging.error(f"Claude API error: {response.status_code} - {response.text}")
+                # Read only the start of the error body and release the connection
+                error_body = claude_analyzer._read_error_body(response)
+                logging.error(f"Claude API error: {response.status_code} - {error_body.decode('utf-8', 'replace')}")
                 # Fall back to simulated analysis if API call fails
                 return _simulated_analysis(text_content, thread_id)
+            
+            # Extract the JSON from the text blocks
+            json_text, _, _ = claude_analyzer.read_streamed_content(response)
         except Exception as e:
             logging.error(f"Claude API request failed: {str(e)}")
             return _simulated_analysis(text_content, thread_id)
         
-        # Parse the response
-        claude_response = response.json()
         logging.info(f"Claude API response received for thread {thread_id}")
         
-        # Extract content from Claude's response
-        content = claude_response.get("content", [])
-        if not content or len(content) == 0:
+        if not json_text:
             logging.error(f"Empty content in Claude response for thread {thread_id}")
             return _simulated_analysis(text_content, thread_id)
-            
-        # Extract the JSON from the text blocks
-        json_text = ""
-        for block in content:
-            if block.get("type") == "text":
-                json_text += block.get("text", "")
         
         # Parse the JSON response
         try:
-            analysis_results = json.loads(json_text)
+            analysis_results = orjson.loads(json_text)
             logging.info(f"Successfully parsed Claude analysis for thread {thread_id}")
             return analysis_results
         except json.JSONDecodeError as e:
             logging.error(f"Failed to parse Claude JSON response: {str(e)}")
-            logging.error(f"Raw response: {json_text[:500]}...")
+            logging.error("Raw response: %s...", json_text[:500])
             return _simulated_analysis(text_content, thread_id)
             
     except Exception as e:
@@ -5,30 +5,92 @@ from flask import Blueprint, request, jsonify, session
 from werkzeug.utils import secure_filename
 import os
 import uuid
+import shutil
+import tempfile
 
 from logging_manager import add_log
 import config
+import session_store
 from thread_extractor import extract_threads_from_chat_file
 
 # Create a Blueprint
 upload_bp = Blueprint('upload', __name__)
 
+def save_upload_stream(stream, dest_path, size=None):
+    """
+    Copy an upload stream to dest_path in large blocks.
+    
+    The data is written to a temporary file next to the destination and moved
+    into place once complete, so a partial upload never replaces a good file.
+    If size is given the stream must be backed by a real file descriptor, and
+    the data is copied in the kernel with os.sendfile where available.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path) or '.', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            copied = 0
+            if size is not None and hasattr(os, 'sendfile'):
+                copied = _sendfile_upload(stream, out, size)
+                stream.seek(copied)
+            while True:
+                chunk = stream.read(config.UPLOAD_BUFFER_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _sendfile_upload(stream, out, size):
+    """
+    Copy up to size bytes from the start of stream into out with os.sendfile
+    
+    Returns the number of bytes copied; the caller copies any remainder the
+    usual way, e.g. if the filesystem doesn't support sendfile.
+    """
+    in_fd = stream.fileno()
+    out_fd = out.fileno()
+    offset = 0
+    try:
+        while offset < size:
+            sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+            if not sent:
+                break
+            offset += sent
+    except OSError as e:
+        add_log(f"sendfile failed after {offset} bytes, copying the rest: {str(e)}", "warning")
+    
+    # sendfile writes through the descriptor, so move the file position past it
+    out.seek(offset)
+    return offset
+
 @upload_bp.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload and store the file"""
+    """
+    Handle file upload and store the file
+    
+    Clients can send the raw file as the request body with its name in the
+    `filename` query arg, which skips werkzeug's multipart parser entirely.
+    Multipart form uploads are still accepted as a fallback.
+    """
     try:
-        # Check if the post request has the file part
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file part'}), 400
-            
-        file = request.files['file']
-        
-        # If user does not select file, browser also submits an empty part without filename
-        if file.filename == '':
-            return jsonify({'error': 'No selected file'}), 400
+        if request.mimetype == 'multipart/form-data':
+            # Reject a missing file part, and the empty part browsers send when no file is selected
+            if not (file := request.files.get('file')) or not (original_filename := file.filename):
+                return jsonify({'error': 'No selected file'}), 400
+                
+            source = file.stream
+        else:
+            # Raw body upload - the filename travels in the query string
+            if not (original_filename := request.args.get('filename')):
+                return jsonify({'error': 'No filename provided'}), 400
+                
+            source = request.stream
             
         # Check if file has allowed extension
-        if file and config.allowed_file(file.filename):
+        if config.allowed_file(original_filename):
             # Get or create session ID
             session_id = session.get('session_id')
             if not session_id:
@@ -40,18 +102,34 @@ def upload_file():
             os.makedirs(session_dir, exist_ok=True)
             
             # Secure the filename and store it
-            filename = secure_filename(file.filename)
+            filename = secure_filename(original_filename)
             upload_path = os.path.join(config.UPLOAD_FOLDER, filename)
-            file.save(upload_path)
-            
-            # Set current filename in session
-            session['filename'] = filename
+            threads_dir = os.path.join(session_dir, 'threads')
             
-            add_log(f"File uploaded: {filename}")
+            # Buffer the upload (in memory unless it's large) so threads are
+            # parsed from the buffer instead of re-reading the saved file
+            with tempfile.SpooledTemporaryFile(max_size=config.UPLOAD_SPOOL_SIZE) as spool:
+                shutil.copyfileobj(source, spool, config.UPLOAD_BUFFER_SIZE)
+                upload_size = spool.tell()
+                
+                # Persist once so /extract_threads can re-process it later.
+                # Large uploads have already rolled over to a temp file, which
+                # can be copied to the upload folder without leaving the kernel
+                spool.seek(0)
+                on_disk = upload_size > config.UPLOAD_SPOOL_SIZE
+                save_upload_stream(spool, upload_path, size=upload_size if on_disk else None)
+                
+                # Set current filename in session
+                session_store.set_session_values(session_id, filename=filename)
+                
+                add_log(f"File uploaded: {filename}")
+                
+                # Extract thread information from the file
+                spool.seek(0)
+                threads_extracted, messages_processed, thread_files = extract_threads_from_chat_file(upload_path, threads_dir, source=spool)
             
-            # Extract thread information from the file
-            threads_dir = os.path.join(session_dir, 'threads')
-            threads_extracted, messages_processed, thread_files = extract_threads_from_chat_file(upload_path, threads_dir)
+            # Remember how many threads the session has so status endpoints don't rescan the directory
+            session_store.set_session_values(session_id, threads_available=len(thread_files))
             
             return jsonify({
                 'status': 'success', 
@@ -80,14 +158,16 @@ def extract_threads():
         session_id = session.get('session_id')
         if not session_id:
             session_id = data.get('session_id')
+            if not session_store.is_valid_session_id(session_id):
+                session_id = None
             if session_id:
                 session['session_id'] = session_id
         
-        filename = session.get('filename')
+        filename = session_store.get_session_value(session_id, 'filename')
         if not filename:
             filename = data.get('filename')
-            if filename:
-                session['filename'] = filename
+            if filename and session_id:
+                session_store.set_session_values(session_id, filename=filename)
         
         if not session_id or not filename:
             add_log("No session or filename found", "error")
@@ -108,7 +188,7 @@ def extract_threads():
             thread_count, new_messages, thread_list = extract_threads_from_chat_file(filepath, threads_dir)
             
             # Store thread count in session
-            session['thread_count'] = thread_count
+            session_store.set_session_values(session_id, thread_count=thread_count, threads_available=len(thread_list))
             
             # Return success with thread count
             return jsonify({
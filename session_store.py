@@ -0,0 +1,140 @@
+"""
+Server-side session data for HitCraft Chat Analyzer
+
+Only the session ID travels in the Flask session cookie. Per-session values
+(uploaded filename, thread count, ...) are kept in
+temp_chunks/<session_id>/session.json with an in-process cache in front of it,
+so hot endpoints don't pay for signing and re-sending a growing cookie and any
+worker can resolve the same session.
+
+If REDIS_URL is set (and the redis package is installed) session values are
+kept in a Redis hash per session instead, so workers on different hosts share
+them too.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+import orjson
+import config
+from logging_manager import add_log
+
+SESSION_FILE = 'session.json'
+REDIS_KEY_PREFIX = 'hitcraft:session:'
+
+# Session IDs are 128 random bits in hex (optionally in UUID form); anything
+# else is rejected before it's used in a file path or cache key
+SESSION_ID_PATTERN = re.compile(r'[0-9a-f]{32}|[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}')
+
+# In-process LRU cache of session data: session ID -> (file mtime, data)
+SESSION_CACHE_SIZE = 256
+_session_cache = OrderedDict()
+_session_lock = threading.Lock()
+
+def _create_redis_client():
+    """Return a Redis client if REDIS_URL is configured, otherwise None"""
+    if not config.REDIS_URL:
+        return None
+    try:
+        import redis
+        return redis.Redis.from_url(config.REDIS_URL)
+    except ImportError:
+        add_log("REDIS_URL is set but the redis package is not installed, using file-backed sessions", "warning")
+        return None
+
+_redis = _create_redis_client()
+
+def is_valid_session_id(session_id):
+    """Return True if session_id has the format of the IDs this app issues"""
+    return isinstance(session_id, str) and SESSION_ID_PATTERN.fullmatch(session_id) is not None
+
+def _cache_session(session_id, mtime, data):
+    """Cache a session's data, evicting the least recently used session past SESSION_CACHE_SIZE"""
+    _session_cache[session_id] = (mtime, data)
+    _session_cache.move_to_end(session_id)
+    if len(_session_cache) > SESSION_CACHE_SIZE:
+        _session_cache.popitem(last=False)
+
+def _session_path(session_id):
+    """Return the path of the session data file"""
+    return os.path.join(config.TEMP_FOLDER, session_id, SESSION_FILE)
+
+def _load_session(session_id):
+    """
+    Return the session dict, reloading it from disk only if another worker
+    has rewritten the file since it was cached
+    """
+    path = _session_path(session_id)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    
+    # Sessions without a file aren't cached, so unknown IDs can't fill the cache
+    if mtime is None:
+        _session_cache.pop(session_id, None)
+        return {}
+    
+    cached = _session_cache.get(session_id)
+    if cached is not None and cached[0] == mtime:
+        _session_cache.move_to_end(session_id)
+        return cached[1]
+    
+    try:
+        with open(path, 'rb') as f:
+            data = orjson.loads(f.read())
+    except Exception as e:
+        add_log(f"Error loading session data for {session_id}: {str(e)}", "error")
+        return {}
+    _cache_session(session_id, mtime, data)
+    return data
+
+def get_session_value(session_id, key, default=None):
+    """
+    Get a value stored for a session
+    
+    Args:
+        session_id: Session ID from the cookie
+        key: Name of the value
+        default: Returned if the session or key doesn't exist
+    """
+    if not is_valid_session_id(session_id):
+        return default
+    if _redis is not None:
+        value = _redis.hget(REDIS_KEY_PREFIX + session_id, key)
+        return default if value is None else orjson.loads(value)
+    with _session_lock:
+        return _load_session(session_id).get(key, default)
+
+def set_session_values(session_id, **values):
+    """
+    Store one or more values for a session and persist them
+    
+    Args:
+        session_id: Session ID from the cookie
+        **values: Values to store
+        
+    Raises:
+        ValueError: If session_id isn't a valid session ID
+    """
+    if not is_valid_session_id(session_id):
+        raise ValueError("Invalid session ID")
+    if _redis is not None:
+        redis_key = REDIS_KEY_PREFIX + session_id
+        pipe = _redis.pipeline()
+        pipe.hset(redis_key, mapping={key: orjson.dumps(value) for key, value in values.items()})
+        pipe.expire(redis_key, config.SESSION_TTL)
+        pipe.execute()
+        return
+    
+    with _session_lock:
+        data = _load_session(session_id)
+        data.update(values)
+    
+        path = _session_path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(data))
+        os.replace(tmp_path, path)
+        _cache_session(session_id, os.stat(path).st_mtime_ns, data)
@@ -2,7 +2,7 @@ import re
 import os
 import chardet
 from striprtf.striprtf import rtf_to_text
-from typing import List
+from typing import List, Iterator
 
 # Maximum chunk size in characters that Claude can handle
 MAX_CHUNK_SIZE = 100000  # 100K characters - Claude 3 Opus can handle this
@@ -53,62 +53,53 @@ def read_file(file_path):
         except Exception as e2:
             raise ValueError(f"Failed to read file with any encoding method: {e}, then: {e2}")
 
-def create_chunks(text: str, preserve_thread_boundaries: bool = True) -> List[str]:
+# Marks the start of each conversation in formatted chat text
+THREAD_PATTERN = re.compile(r'(?:^|\n)Conversation #\d+:')
+
+def iter_chunks(text: str, preserve_thread_boundaries: bool = True) -> Iterator[str]:
     """
     Split a text into chunks of maximum size, respecting thread boundaries if specified.
     
+    Chunks are yielded one at a time as slices of the text, so callers that
+    write or analyze them as they go never hold a second copy of the whole text.
+    
     Args:
         text: Text to split into chunks
         preserve_thread_boundaries: If True, try to keep threads together
         
-    Returns:
-        List of text chunks
+    Yields:
+        Text chunks in order
     """
     # If text is smaller than the max chunk size, return it as is
     if len(text) <= MAX_CHUNK_SIZE:
-        return [text]
-        
-    chunks = []
+        yield text
+        return
     
     if preserve_thread_boundaries:
         # Try to preserve thread boundaries by splitting on thread patterns
-        thread_pattern = r'(?:^|\n)Conversation #\d+:'
-        thread_matches = list(re.finditer(thread_pattern, text))
+        thread_starts = [match.start() for match in THREAD_PATTERN.finditer(text)]
         
-        # Group threads into chunks that fit within MAX_CHUNK_SIZE
-        if thread_matches:
-            start_idx = 0
-            current_chunk = ""
+        # Group threads into chunks that fit within MAX_CHUNK_SIZE. Threads are
+        # contiguous, so a chunk is just the span from its first to last thread.
+        if thread_starts:
+            thread_ends = thread_starts[1:] + [len(text)]
+            chunk_start = chunk_end = thread_starts[0]
             
-            for i, match in enumerate(thread_matches):
-                thread_start = match.start()
-                
-                # Get the thread content (from this thread start to next thread start or end of text)
-                if i < len(thread_matches) - 1:
-                    thread_end = thread_matches[i + 1].start()
-                    thread_content = text[thread_start:thread_end]
-                else:
-                    thread_content = text[thread_start:]
-                
+            for thread_start, thread_end in zip(thread_starts, thread_ends):
                 # If adding this thread would exceed chunk size and we already have content
-                if len(current_chunk) + len(thread_content) > MAX_CHUNK_SIZE and current_chunk:
+                if (chunk_end - chunk_start) + (thread_end - thread_start) > MAX_CHUNK_SIZE and chunk_end > chunk_start:
                     # Save current chunk and start a new one
-                    chunks.append(current_chunk)
-                    current_chunk = thread_content
-                else:
-                    # Add this thread to the current chunk
-                    current_chunk += thread_content
+                    yield text[chunk_start:chunk_end]
+                    chunk_start = thread_start
+                chunk_end = thread_end
             
             # Add the last chunk if it has content
-            if current_chunk:
-                chunks.append(current_chunk)
-                
-            # If we successfully created chunks, return them
-            if chunks:
-                return chunks
-    
-    # Fallback to simple splitting if thread preservation didn't work well
-    # or if preserve_thread_boundaries is False
+            if chunk_end > chunk_start:
+                yield text[chunk_start:chunk_end]
+            return
+    
+    # Fallback to simple splitting if preserve_thread_boundaries is False
+    # or the text has no thread markers
     current_pos = 0
     while current_pos < len(text):
         chunk_end = min(current_pos + MAX_CHUNK_SIZE, len(text))
@@ -126,10 +117,21 @@ def create_chunks(text: str, preserve_thread_boundaries: bool = True) -> List[st
                 if last_break > current_pos + MAX_CHUNK_SIZE * 0.9:
                     chunk_end = last_break + 1  # Include the newline
         
-        chunks.append(text[current_pos:chunk_end])
+        yield text[current_pos:chunk_end]
         current_pos = chunk_end
+
+def create_chunks(text: str, preserve_thread_boundaries: bool = True) -> List[str]:
+    """
+    Split a text into chunks of maximum size, respecting thread boundaries if specified.
     
-    return chunks
+    Args:
+        text: Text to split into chunks
+        preserve_thread_boundaries: If True, try to keep threads together
+        
+    Returns:
+        List of text chunks
+    """
+    return list(iter_chunks(text, preserve_thread_boundaries))
 
 def clean_chunk(chunk):
     """Clean and prepare a chunk for analysis"""
@@ -2,15 +2,36 @@
 Thread analysis functionality for HitCraft Chat Analyzer
 """
 import os
-import json
+import orjson
 import datetime
 import copy
-import claude_analyzer
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from logging_manager import add_log
+import config
 import time_utils
 
+def _replace_file(path, data):
+    """
+    Write data to path atomically, so readers (and HTTP ETags derived from the
+    file's mtime and size) never see a partially written result file
+    """
+    # A unique temp file per write, since analyses running in the same
+    # process can write the same result file at once
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 def analyze_threads_in_background(api_key, session_id, filename, threads_dir, thread_files, analysis_state):
-    """Analyze threads one by one in the background"""
+    """Analyze threads concurrently in the background"""
+    import claude_analyzer
+    
     try:
         # STRICT ENFORCEMENT: Never process more threads than originally specified
         thread_limit = len(thread_files)
@@ -40,8 +61,8 @@ def analyze_threads_in_background(api_key, session_id, filename, threads_dir, th
         # Check for existing results to accumulate analysis over time
         if os.path.exists(session_result_path):
             try:
-                with open(session_result_path, 'r') as f:
-                    combined_results = json.load(f)
+                with open(session_result_path, 'rb') as f:
+                    combined_results = orjson.loads(f.read())
                 add_log("Found existing analysis results, will accumulate new insights")
                 
                 # Check if we have thread results field
@@ -99,8 +120,8 @@ def analyze_threads_in_background(api_key, session_id, filename, threads_dir, th
         thread_metadata = {}
         if os.path.exists(thread_list_path):
             try:
-                with open(thread_list_path, 'r') as f:
-                    thread_list = json.load(f)
+                with open(thread_list_path, 'rb') as f:
+                    thread_list = orjson.loads(f.read())
                     # Create a map of thread ID to metadata
                     thread_metadata = {t['id']: t for t in thread_list}
             except Exception as e:
@@ -124,41 +145,44 @@ def analyze_threads_in_background(api_key, session_id, filename, threads_dir, th
         # One last safety check - maximum number to process is exactly what was specified
         MAX_THREADS_TO_PROCESS = thread_limit
         
-        for i, thread_file in enumerate(limited_thread_files):
-            # CRITICAL: This is the most important check - if we've reached the limit, stop IMMEDIATELY
-            if threads_analyzed >= MAX_THREADS_TO_PROCESS:
-                add_log(f"HARD LIMIT ENFORCED: Thread limit of {thread_limit} reached. Stopping analysis immediately.")
-                break
-                
-            # Update state
-            analysis_state['current_thread'] = i + 1
-            analysis_state['last_updated'] = datetime.datetime.now()
-            
+        # Skip threads that already have results, then analyze the rest
+        # concurrently - each thread is an independent, network-bound Claude call
+        analyzed_ids = {result.get('thread_id') for result in combined_results.get('thread_results', [])}
+        pending_files = []
+        for thread_file in limited_thread_files[:MAX_THREADS_TO_PROCESS]:
+            thread_id = thread_file.replace('.txt', '')
+            if thread_id in analyzed_ids:
+                add_log(f"Thread {thread_id} already analyzed, skipping")
+                skipped_threads += 1
+            else:
+                pending_files.append(thread_file)
+        
+        def analyze_thread_file(thread_file):
             # Extract thread ID from filename
             thread_id = thread_file.replace('.txt', '')
             thread_path = os.path.join(threads_dir, thread_file)
             
-            add_log(f"Processing thread {i+1}/{thread_limit}: {thread_id}")
-            
-            # Check if we already have results for this thread
-            thread_exists = False
-            for result in combined_results.get('thread_results', []):
-                if result.get('thread_id') == thread_id:
-                    thread_exists = True
-                    add_log(f"Thread {thread_id} already analyzed, skipping")
-                    skipped_threads += 1
-                    break
-            
-            if thread_exists:
-                continue
-            
-            # Read thread content
-            with open(thread_path, 'r', encoding='utf-8') as f:
-                thread_content = f.read()
-            
-            # Analyze the thread with Claude
             try:
-                thread_result = claude_analyzer.analyze_single_thread(thread_content, api_key)
+                # Read thread content
+                with open(thread_path, 'r', encoding='utf-8') as f:
+                    thread_content = f.read()
+                
+                # Analyze the thread with Claude
+                return thread_id, claude_analyzer.analyze_single_thread(thread_content, api_key)
+            except Exception as e:
+                add_log(f"Error analyzing thread {thread_id}: {str(e)}", "error")
+                return thread_id, None
+        
+        max_workers = max(1, min(config.ANALYSIS_MAX_WORKERS, len(pending_files)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map yields in input order, so results stay in thread order
+            for i, (thread_id, thread_result) in enumerate(executor.map(analyze_thread_file, pending_files)):
+                # Update state
+                analysis_state['current_thread'] = skipped_threads + i + 1
+                analysis_state['last_updated'] = datetime.datetime.now()
+                
+                if thread_result is None:
+                    continue
                 
                 # Add thread ID and metadata to the result
                 thread_result['thread_id'] = thread_id
@@ -178,14 +202,6 @@ def analyze_threads_in_background(api_key, session_id, filename, threads_dir, th
                 threads_analyzed += 1
                 
                 add_log(f"Thread {thread_id} analysis completed ({threads_analyzed}/{thread_limit})")
-                
-                # Final safety check - stop if we've reached the thread limit
-                if threads_analyzed >= thread_limit:
-                    add_log(f"Thread limit of {thread_limit} reached. Stopping analysis.")
-                    break
-                
-            except Exception as e:
-                add_log(f"Error analyzing thread {thread_id}: {str(e)}", "error")
         
         # EMERGENCY STOP - if we somehow processed more threads than requested, log an error
         if threads_analyzed > thread_limit:
@@ -216,12 +232,10 @@ def analyze_threads_in_background(api_key, session_id, filename, threads_dir, th
         else:
             add_log(f"No new threads analyzed, keeping existing insights ({skipped_threads} threads skipped)")
         
-        # Save updated results to both session and global files
-        with open(session_result_path, 'w', encoding='utf-8') as f:
-            json.dump(combined_results, f, indent=2)
-        
-        with open(global_result_path, 'w', encoding='utf-8') as f:
-            json.dump(combined_results, f, indent=2)
+        # Save updated results to both session and global files, encoding them once
+        combined_json = orjson.dumps(combined_results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        _replace_file(session_result_path, combined_json)
+        _replace_file(global_result_path, combined_json)
         
         # Update analysis state with combined results
         analysis_state['combined_results'] = combined_results
@@ -345,6 +359,7 @@ def filter_results_by_time(results, start_date=None, end_date=None):
         add_log(f"Regenerating insights for {len(filtered_threads)} threads in time period")
         
         # Generate combined insights based on filtered threads
+        import claude_analyzer
         updated_insights = claude_analyzer.combine_results(filtered_threads)
         
         # Update insight fields while keeping thread_results and metadata
@@ -4,20 +4,31 @@ Thread extraction functionality for HitCraft Chat Analyzer
 import os
 import json
 import hashlib
+import orjson
 import datetime
 import re
+from concurrent.futures import ThreadPoolExecutor
 from logging_manager import add_log
 import time_utils
 
-def extract_threads_from_chat_file(filepath, threads_dir):
+# Number of threads used to write per-thread files during extraction
+THREAD_WRITE_WORKERS = 16
+
+def extract_threads_from_chat_file(filepath, threads_dir, source=None):
     """
     Extract conversation threads from a chat file by grouping messages with the same threadId.
     Handles tracking processed message IDs to avoid duplicates.
+    
+    If source is given (a binary file-like object holding the same data, e.g.
+    the upload buffer), it is parsed instead of reopening filepath.
     """
     try:
         # Load the JSON data from file
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if source is not None:
+            data = orjson.loads(source.read())
+        else:
+            with open(filepath, 'rb') as f:
+                data = orjson.loads(f.read())
         
         # Create threads directory if it doesn't exist
         os.makedirs(threads_dir, exist_ok=True)
@@ -42,8 +53,8 @@ def extract_threads_from_chat_file(filepath, threads_dir):
         # Check if we have previously processed message IDs
         if os.path.exists(processed_ids_file):
             try:
-                with open(processed_ids_file, 'r') as f:
-                    processed_ids = set(json.load(f))
+                with open(processed_ids_file, 'rb') as f:
+                    processed_ids = set(orjson.loads(f.read()))
                 add_log(f"Loaded {len(processed_ids)} previously processed message IDs")
             except Exception as e:
                 add_log(f"Error loading processed message IDs: {str(e)}", "warning")
@@ -127,6 +138,7 @@ def extract_threads_from_chat_file(filepath, threads_dir):
         
         # Save each thread to a file
         thread_list = []
+        write_jobs = []
         
         for thread_id, messages in threads.items():
             if not messages:
@@ -163,27 +175,26 @@ def extract_threads_from_chat_file(filepath, threads_dir):
                 'message_count': len(messages)
             }
             
-            with open(thread_json_path, 'w', encoding='utf-8') as f:
-                json.dump(thread_data, f, indent=2)
-                
             # Save as text for easier human reading
             thread_text_path = os.path.join(threads_dir, f"{safe_thread_id}.txt")
-            with open(thread_text_path, 'w', encoding='utf-8') as f:
-                for msg in messages:
-                    role = msg.get('role', 'UNKNOWN')
-                    content = msg.get('content', '')
-                    
-                    # Handle content that might be a list
-                    if isinstance(content, list):
-                        # Join list items into a single string
-                        content = ' '.join([str(item) for item in content])
-                    
-                    if role.lower() == 'user':
-                        f.write(f"USER: {content}\n\n")
-                    elif role.lower() == 'assistant':
-                        f.write(f"ASSISTANT: {content}\n\n")
-                    else:
-                        f.write(f"{role.upper()}: {content}\n\n")
+            text_parts = []
+            for msg in messages:
+                role = msg.get('role', 'UNKNOWN')
+                content = msg.get('content', '')
+                
+                # Handle content that might be a list
+                if isinstance(content, list):
+                    # Join list items into a single string
+                    content = ' '.join([str(item) for item in content])
+                
+                if role.lower() == 'user':
+                    text_parts.append(f"USER: {content}\n\n")
+                elif role.lower() == 'assistant':
+                    text_parts.append(f"ASSISTANT: {content}\n\n")
+                else:
+                    text_parts.append(f"{role.upper()}: {content}\n\n")
+            
+            write_jobs.append((thread_json_path, thread_data, thread_text_path, ''.join(text_parts)))
             
             # Get preview content for thread list
             preview_content = messages[0].get('content', '')
@@ -200,14 +211,18 @@ def extract_threads_from_chat_file(filepath, threads_dir):
                 'preview': preview
             })
         
+        # Write the thread files concurrently to overlap disk I/O
+        with ThreadPoolExecutor(max_workers=THREAD_WRITE_WORKERS) as executor:
+            list(executor.map(_write_thread_files, write_jobs))
+        
         # Save thread list for UI browsing
         thread_list_path = os.path.join(os.path.dirname(threads_dir), 'thread_list.json')
         
         # If thread list already exists, merge with it
         if os.path.exists(thread_list_path):
             try:
-                with open(thread_list_path, 'r') as f:
-                    existing_thread_list = json.load(f)
+                with open(thread_list_path, 'rb') as f:
+                    existing_thread_list = orjson.loads(f.read())
                     
                 # Create a set of existing thread IDs
                 existing_thread_ids = {thread.get('id') for thread in existing_thread_list}
@@ -226,12 +241,12 @@ def extract_threads_from_chat_file(filepath, threads_dir):
         # Sort thread list by last message time
         thread_list.sort(key=lambda x: str(x.get('last_message_time', '')) if isinstance(x.get('last_message_time'), (dict, list)) else x.get('last_message_time', ''), reverse=True)
         
-        with open(thread_list_path, 'w') as f:
-            json.dump(thread_list, f, indent=2)
+        with open(thread_list_path, 'wb') as f:
+            f.write(orjson.dumps(thread_list, option=orjson.OPT_INDENT_2))
             
         # Save the updated processed message IDs
-        with open(processed_ids_file, 'w') as f:
-            json.dump(list(processed_ids), f)
+        with open(processed_ids_file, 'wb') as f:
+            f.write(orjson.dumps(list(processed_ids)))
             
         return len(threads), new_msg_count, thread_list
         
@@ -241,6 +256,26 @@ def extract_threads_from_chat_file(filepath, threads_dir):
         add_log(traceback.format_exc(), "error")
         raise
 
+def _write_file_bytes(path, data):
+    """
+    Write a complete file with os.write, skipping the buffer and text encoder
+    a file object would allocate for a single write
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def _write_thread_files(job):
+    """Write one thread's JSON and text files"""
+    thread_json_path, thread_data, thread_text_path, thread_text = job
+    
+    _write_file_bytes(thread_json_path, orjson.dumps(thread_data, option=orjson.OPT_INDENT_2))
+    _write_file_bytes(thread_text_path, thread_text.encode('utf-8'))
+
 def sanitize_thread_id(thread_id):
     """
     Sanitizes a thread ID to make it safe for filenames.
@@ -5,11 +5,13 @@ This module provides functionality to store threads persistently,
 track analyzed threads, and maintain analysis history.
 """
 import os
+import re
 import json
+import orjson
 import time
-import glob
 import logging
 import datetime
+import functools
 from collections import defaultdict
 import config
 import hashlib
@@ -23,6 +25,58 @@ STORAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), THREADS_F
 ANALYSIS_HISTORY_PATH = os.path.join(DATA_FOLDER, "analysis_history.json")
 THREAD_INDEX_PATH = os.path.join(DATA_FOLDER, "thread_index.json")
 
+# Messages in a thread transcript are separated by blank lines
+MESSAGE_SEPARATOR = re.compile(rb'\n\n+')
+
+def _read_json(path):
+    """Load a JSON file with orjson"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def _write_json(path, data):
+    """Write data to a JSON file with orjson, keeping the 2-space indent"""
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+
+@functools.lru_cache(maxsize=32)
+def _load_sorted_thread_index(path, mtime_ns, size):
+    """
+    Parse a thread index and sort its threads newest first
+    
+    Cached on the file's mtime and size, so repeated page requests skip the
+    disk read, parse and sort until the index is rewritten. Callers must
+    treat the result as read-only.
+    """
+    thread_index = _read_json(path)
+    
+    # Sort threads by last_message_time (newest first)
+    try:
+        thread_index['threads'].sort(
+            key=lambda x: str(x.get('last_message_time', '')) if isinstance(x.get('last_message_time'), (dict, list)) 
+            else x.get('last_message_time', ''), 
+            reverse=True
+        )
+    except Exception as e:
+        add_log(f"Error sorting threads: {str(e)}", "error")
+    
+    return thread_index
+
+@functools.lru_cache(maxsize=32)
+def _load_thread_meta_by_id(path, mtime_ns, size):
+    """Map thread ID -> index metadata for one version of the index file"""
+    thread_index = _load_sorted_thread_index(path, mtime_ns, size)
+    return {t['id']: t for t in thread_index['threads']}
+
+def _get_sorted_thread_index():
+    """Return the cached, sorted thread index for the current version of the file"""
+    st = os.stat(THREAD_INDEX_PATH)
+    return _load_sorted_thread_index(THREAD_INDEX_PATH, st.st_mtime_ns, st.st_size)
+
+def _get_thread_meta_by_id():
+    """Return the cached thread ID -> metadata map for the current version of the index"""
+    st = os.stat(THREAD_INDEX_PATH)
+    return _load_thread_meta_by_id(THREAD_INDEX_PATH, st.st_mtime_ns, st.st_size)
+
 def initialize_storage():
     """
     Create necessary directories and index files for persistent storage
@@ -33,23 +87,21 @@ def initialize_storage():
     
     # Create thread index if it doesn't exist
     if not os.path.exists(THREAD_INDEX_PATH):
-        with open(THREAD_INDEX_PATH, 'w', encoding='utf-8') as f:
-            json.dump({
-                "threads": [],
-                "total_count": 0,
-                "analyzed_count": 0,
-                "last_updated": datetime.datetime.now().isoformat()
-            }, f, indent=2)
+        _write_json(THREAD_INDEX_PATH, {
+            "threads": [],
+            "total_count": 0,
+            "analyzed_count": 0,
+            "last_updated": datetime.datetime.now().isoformat()
+        })
         add_log("Created new thread index file")
         
     # Create analysis history if it doesn't exist
     if not os.path.exists(ANALYSIS_HISTORY_PATH):
-        with open(ANALYSIS_HISTORY_PATH, 'w', encoding='utf-8') as f:
-            json.dump({
-                "analyses": [],
-                "latest": None,
-                "last_updated": datetime.datetime.now().isoformat()
-            }, f, indent=2)
+        _write_json(ANALYSIS_HISTORY_PATH, {
+            "analyses": [],
+            "latest": None,
+            "last_updated": datetime.datetime.now().isoformat()
+        })
         add_log("Created new analysis history file")
 
 def store_threads_permanently(session_id, threads_dir):
@@ -68,8 +120,7 @@ def store_threads_permanently(session_id, threads_dir):
     
     # Load the thread index
     try:
-        with open(THREAD_INDEX_PATH, 'r', encoding='utf-8') as f:
-            thread_index = json.load(f)
+        thread_index = _read_json(THREAD_INDEX_PATH)
     except Exception as e:
         add_log(f"Error loading thread index, creating new one: {str(e)}", "error")
         thread_index = {
@@ -94,8 +145,7 @@ def store_threads_permanently(session_id, threads_dir):
     
     if os.path.exists(thread_list_path):
         try:
-            with open(thread_list_path, 'r', encoding='utf-8') as f:
-                session_threads = json.load(f)
+            session_threads = _read_json(thread_list_path)
         except Exception as e:
             add_log(f"Error loading thread list: {str(e)}", "error")
             session_threads = []
@@ -112,25 +162,27 @@ def store_threads_permanently(session_id, threads_dir):
                     thread_files.append((thread_id, thread_json, thread_txt, thread_meta))
     else:
         # Fallback to directory scan
-        json_files = [f for f in os.listdir(threads_dir) if f.endswith('.json') and f != 'thread_list.json']
+        json_files = [
+            entry for entry in os.scandir(threads_dir)
+            if entry.name.endswith('.json') and entry.name != 'thread_list.json'
+        ]
         
         for json_file in json_files:
-            thread_id = os.path.splitext(json_file)[0]
-            thread_json = os.path.join(threads_dir, json_file)
+            thread_id = os.path.splitext(json_file.name)[0]
+            thread_json = json_file.path
             thread_txt = os.path.join(threads_dir, f"{thread_id}.txt")
             
             if os.path.exists(thread_txt):
                 # Create bare metadata
                 thread_meta = {'id': thread_id}
                 try:
-                    with open(thread_json, 'r', encoding='utf-8') as f:
-                        thread_data = json.load(f)
-                        if 'message_count' in thread_data:
-                            thread_meta['message_count'] = thread_data['message_count']
-                        if 'first_message_time' in thread_data:
-                            thread_meta['first_message_time'] = thread_data['first_message_time']
-                        if 'last_message_time' in thread_data:
-                            thread_meta['last_message_time'] = thread_data['last_message_time']
+                    thread_data = _read_json(thread_json)
+                    if 'message_count' in thread_data:
+                        thread_meta['message_count'] = thread_data['message_count']
+                    if 'first_message_time' in thread_data:
+                        thread_meta['first_message_time'] = thread_data['first_message_time']
+                    if 'last_message_time' in thread_data:
+                        thread_meta['last_message_time'] = thread_data['last_message_time']
                 except Exception as e:
                     add_log(f"Error reading thread data: {str(e)}", "error")
                 
@@ -166,8 +218,7 @@ def store_threads_permanently(session_id, threads_dir):
         thread_index['last_updated'] = datetime.datetime.now().isoformat()
         
         # Write updated index
-        with open(THREAD_INDEX_PATH, 'w', encoding='utf-8') as f:
-            json.dump(thread_index, f, indent=2)
+        _write_json(THREAD_INDEX_PATH, thread_index)
     
     return threads_added, thread_index['total_count']
 
@@ -185,10 +236,9 @@ def get_all_threads(page=1, per_page=10):
     # Make sure storage is initialized
     initialize_storage()
     
-    # Load the thread index
+    # Load the thread index (already sorted newest first)
     try:
-        with open(THREAD_INDEX_PATH, 'r', encoding='utf-8') as f:
-            thread_index = json.load(f)
+        thread_index = _get_sorted_thread_index()
     except Exception as e:
         add_log(f"Error loading thread index: {str(e)}", "error")
         thread_index = {
@@ -197,16 +247,6 @@ def get_all_threads(page=1, per_page=10):
             "analyzed_count": 0
         }
     
-    # Sort threads by last_message_time (newest first)
-    try:
-        thread_index['threads'].sort(
-            key=lambda x: str(x.get('last_message_time', '')) if isinstance(x.get('last_message_time'), (dict, list)) 
-            else x.get('last_message_time', ''), 
-            reverse=True
-        )
-    except Exception as e:
-        add_log(f"Error sorting threads: {str(e)}", "error")
-    
     # Calculate pagination
     total = len(thread_index['threads'])
     total_pages = (total + per_page - 1) // per_page
@@ -243,14 +283,7 @@ def get_thread_content(thread_id):
     
     # Check thread exists in index
     try:
-        with open(THREAD_INDEX_PATH, 'r', encoding='utf-8') as f:
-            thread_index = json.load(f)
-            
-        thread_meta = None
-        for t in thread_index['threads']:
-            if t['id'] == thread_id:
-                thread_meta = t
-                break
+        thread_meta = _get_thread_meta_by_id().get(thread_id)
                 
         if not thread_meta:
             add_log(f"Thread {thread_id} not found in index", "error")
@@ -269,18 +302,21 @@ def get_thread_content(thread_id):
     
     # Load thread content
     try:
-        with open(thread_txt_path, 'r', encoding='utf-8') as f:
+        with open(thread_txt_path, 'rb') as f:
             content = f.read()
         
-        thread_data = {"id": thread_id, "content": content}
+        # One entry per message block; split on the raw bytes so blank runs are
+        # skipped in a single C-level scan and only real messages get decoded
+        messages = [m.decode('utf-8') for m in MESSAGE_SEPARATOR.split(content.strip()) if m]
+        
+        thread_data = {"id": thread_id, "content": messages}
         
         # Add metadata from JSON file if available
         if os.path.exists(thread_json_path):
             try:
-                with open(thread_json_path, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
-                    # Merge JSON data with thread_data
-                    thread_data.update(json_data)
+                json_data = _read_json(thread_json_path)
+                # Merge JSON data with thread_data
+                thread_data.update(json_data)
             except Exception as e:
                 add_log(f"Error loading thread JSON: {str(e)}", "error")
         
@@ -307,8 +343,7 @@ def get_unanalyzed_threads(count=10):
     
     # Load the thread index
     try:
-        with open(THREAD_INDEX_PATH, 'r', encoding='utf-8') as f:
-            thread_index = json.load(f)
+        thread_index = _read_json(THREAD_INDEX_PATH)
     except Exception as e:
         add_log(f"Error loading thread index: {str(e)}", "error")
         return []
@@ -352,8 +387,7 @@ def mark_threads_as_analyzed(thread_ids, evidence_map=None):
     
     # Load the thread index
     try:
-        with open(THREAD_INDEX_PATH, 'r', encoding='utf-8') as f:
-            thread_index = json.load(f)
+        thread_index = _read_json(THREAD_INDEX_PATH)
     except Exception as e:
         add_log(f"Error loading thread index: {str(e)}", "error")
         return 0
@@ -379,8 +413,7 @@ def mark_threads_as_analyzed(thread_ids, evidence_map=None):
     thread_index['last_updated'] = datetime.datetime.now().isoformat()
     
     # Write updated index
-    with open(THREAD_INDEX_PATH, 'w', encoding='utf-8') as f:
-        json.dump(thread_index, f, indent=2)
+    _write_json(THREAD_INDEX_PATH, thread_index)
     
     add_log(f"Marked {count_marked} threads as analyzed")
     return count_marked
@@ -425,11 +458,10 @@ def save_analysis_results(results, session_id=None, filename=None, analyzed_thre
     os.makedirs(config.RESULTS_FOLDER, exist_ok=True)
     
     try:
-        with open(results_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                "metadata": analysis_meta,
-                "results": results
-            }, f, indent=2)
+        _write_json(results_file, {
+            "metadata": analysis_meta,
+            "results": results
+        })
         
         add_log(f"Saved analysis results to {results_file}")
     except Exception as e:
@@ -438,8 +470,7 @@ def save_analysis_results(results, session_id=None, filename=None, analyzed_thre
     
     # Update analysis history
     try:
-        with open(ANALYSIS_HISTORY_PATH, 'r', encoding='utf-8') as f:
-            history = json.load(f)
+        history = _read_json(ANALYSIS_HISTORY_PATH)
     except Exception as e:
         add_log(f"Error loading analysis history, creating new one: {str(e)}", "error")
         history = {
@@ -454,8 +485,7 @@ def save_analysis_results(results, session_id=None, filename=None, analyzed_thre
     history['last_updated'] = datetime.datetime.now().isoformat()
     
     # Write updated history
-    with open(ANALYSIS_HISTORY_PATH, 'w', encoding='utf-8') as f:
-        json.dump(history, f, indent=2)
+    _write_json(ANALYSIS_HISTORY_PATH, history)
     
     return analysis_meta
 
@@ -471,8 +501,7 @@ def get_latest_analysis():
     
     # Load analysis history
     try:
-        with open(ANALYSIS_HISTORY_PATH, 'r', encoding='utf-8') as f:
-            history = json.load(f)
+        history = _read_json(ANALYSIS_HISTORY_PATH)
     except Exception as e:
         add_log(f"Error loading analysis history: {str(e)}", "error")
         return None
@@ -490,8 +519,7 @@ def get_latest_analysis():
         return None
     
     try:
-        with open(results_file, 'r', encoding='utf-8') as f:
-            analysis_data = json.load(f)
+        analysis_data = _read_json(results_file)
         
         return analysis_data
     except Exception as e:
@@ -511,8 +539,7 @@ def get_analysis_stats():
     try:
         # First try to load the thread index
         try:
-            with open(THREAD_INDEX_PATH, 'r', encoding='utf-8') as f:
-                thread_index = json.load(f)
+            thread_index = _read_json(THREAD_INDEX_PATH)
         except json.JSONDecodeError as e:
             # Handle corrupted JSON
             add_log(f"Error parsing thread index JSON: {str(e)}", "error")
@@ -535,9 +562,10 @@ def get_analysis_stats():
             
             # Try to recover thread info from the storage directory
             try:
-                thread_files = glob.glob(os.path.join(STORAGE_DIR, "*.txt"))
-                for thread_file in thread_files:
-                    thread_id = os.path.basename(thread_file).replace('.txt', '')
+                for entry in os.scandir(STORAGE_DIR):
+                    thread_id, ext = os.path.splitext(entry.name)
+                    if ext != '.txt':
+                        continue
                     thread_index["threads"].append({
                         "id": thread_id,
                         "analyzed": False,
@@ -550,8 +578,7 @@ def get_analysis_stats():
             
             # Save the new thread index
             try:
-                with open(THREAD_INDEX_PATH, 'w', encoding='utf-8') as f:
-                    json.dump(thread_index, f, indent=2)
+                _write_json(THREAD_INDEX_PATH, thread_index)
                 add_log("Created new thread index file after JSON error", "info")
             except Exception as save_err:
                 add_log(f"Failed to save new thread index: {str(save_err)}", "error")
@@ -593,8 +620,7 @@ def get_evidence_for_insight(insight_key):
     
     # Load the thread index
     try:
-        with open(THREAD_INDEX_PATH, 'r', encoding='utf-8') as f:
-            thread_index = json.load(f)
+        thread_index = _read_json(THREAD_INDEX_PATH)
     except Exception as e:
         add_log(f"Error loading thread index: {str(e)}", "error")
         return []
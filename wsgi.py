@@ -0,0 +1,11 @@
+"""
+WSGI entry point for HitCraft Chat Analyzer
+
+Run with gunicorn, which picks up gunicorn.conf.py from the working directory:
+    gunicorn wsgi:app
+"""
+from app import create_app
+from logging_manager import add_log
+
+app = create_app()
+add_log("HitCraft Chat Analyzer WSGI app created")